@@ -0,0 +1,160 @@
+"""Benchmark the plot functions on synthetic data of increasing size.
+
+For every case and size, records the time to build the chart, the time to
+serialize it to JSON, the peak memory allocated by both and the size of the
+spec. Results are written as JSON, and --compare reports the cases slower or
+larger than a previous run by more than --threshold, exiting non-zero if any.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from timeit import default_timer
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+# Run from a checkout, without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import seaborn_altair as salt
+from seaborn_altair import pyplot
+
+def make_data(n, seed=0):
+    rng = np.random.RandomState(seed)
+    x = rng.rand(n)
+    return pd.DataFrame({
+        "x": x,
+        "y": 2*x + rng.randn(n),
+        "t": np.arange(n, dtype=float),
+        "cat": rng.choice(list("abcdefgh"), n),
+        "hue": rng.choice(["u", "v"], n),
+        "row": rng.choice(["r1", "r2"], n),
+        "col": rng.choice(["c1", "c2", "c3"], n),
+    })
+
+def _facetgrid_hist(data):
+    return salt.FacetGrid(data, row="row", col="col", partitioned=True).map(pyplot.hist, "x")
+
+# name: (build function, largest size it runs at, None for no limit).
+# Cases embedding every row are limited, their specs grow by ~60 bytes a row.
+CASES = {
+    "barplot": (lambda d: salt.barplot(x="cat", y="y", hue="hue", data=d), 1e5),
+    "barplot_server": (lambda d: salt.barplot(x="cat", y="y", hue="hue", data=d, aggregate="server"), None),
+    "countplot": (lambda d: salt.countplot(x="cat", data=d), 1e5),
+    "countplot_server": (lambda d: salt.countplot(x="cat", data=d, aggregate="server"), None),
+    "pointplot": (lambda d: salt.pointplot(x="cat", y="y", hue="hue", data=d), 1e5),
+    "pointplot_server": (lambda d: salt.pointplot(x="cat", y="y", hue="hue", data=d, aggregate="server"), None),
+    "stripplot": (lambda d: salt.stripplot(x="cat", y="y", hue="hue", data=d), 1e5),
+    "boxplot": (lambda d: salt.boxplot(x="cat", y="y", hue="hue", data=d), 1e5),
+    "boxplot_server": (lambda d: salt.boxplot(x="cat", y="y", hue="hue", data=d, aggregate="server"), None),
+    "boxplot_wide": (lambda d: salt.boxplot(data=d[["x", "y", "t"]], aggregate="server"), None),
+    "catplot": (lambda d: salt.catplot(x="cat", y="y", col="col", data=d, kind="bar", aggregate="server"), None),
+    "scatterplot": (lambda d: salt.scatterplot(x="x", y="y", hue="hue", data=d), 1e5),
+    "scatterplot_sampled": (lambda d: salt.scatterplot(x="x", y="y", hue="hue", data=d, max_points=5000, random_state=0), None),
+    "regplot": (lambda d: salt.regplot("x", "y", data=d, n_boot=100, seed=0), 1e5),
+    "lmplot": (lambda d: salt.lmplot("x", "y", data=d, hue="hue", col="col", n_boot=100, seed=0), 1e5),
+    "facetgrid_hist": (_facetgrid_hist, None),
+    "hist": (lambda d: pyplot.hist("x", color="hue", data=d, bins=50), None),
+    "plot": (lambda d: pyplot.plot("t", "y", data=d, decimate=True), None),
+    "scatter": (lambda d: pyplot.scatter("x", "y", color="hue", data=d, max_points=5000, random_state=0), None),
+    "fill_between": (lambda d: pyplot.fill_between("t", "x", "y", data=d, decimate=True), None),
+}
+
+def measure(build, data, validate):
+    tracemalloc.start()
+    start = default_timer()
+    chart = build(data)
+    if isinstance(chart, salt.FacetGrid):
+        chart = chart.chart
+    built = default_timer()
+    spec = json.dumps(chart.to_dict(validate=validate))
+    serialized = default_timer()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return dict(
+        build_s=built - start, serialize_s=serialized - built,
+        peak_bytes=peak, spec_bytes=len(spec)
+    )
+
+def run(cases, sizes, repeat, validate):
+    # Lazy imports and palette caches would otherwise be charged to the first case
+    warmup = make_data(100)
+    for name in cases:
+        CASES[name][0](warmup)
+
+    results = []
+    for size in sizes:
+        data = make_data(int(size))
+        for name in cases:
+            build, max_size = CASES[name]
+            if max_size is not None and size > max_size:
+                continue
+            # Keep the fastest run, the others are slowed down by noise
+            runs = [measure(build, data, validate) for _ in range(repeat)]
+            best = min(runs, key=lambda r: r["build_s"] + r["serialize_s"])
+            best.update(case=name, rows=int(size))
+            results.append(best)
+            print("%-20s %9d rows  build %8.3fs  serialize %8.3fs  peak %8.1fMB  spec %9.1fkB" % (
+                name, size, best["build_s"], best["serialize_s"],
+                best["peak_bytes"] / 2.**20, best["spec_bytes"] / 1024.
+            ))
+            sys.stdout.flush()
+    return results
+
+def compare(results, baseline, threshold, min_seconds=0.05):
+    """Cases slower or with larger specs than in baseline by more than threshold.
+
+    Time differences below min_seconds are ignored as noise.
+    """
+    previous = dict(((r["case"], r["rows"]), r) for r in baseline["results"])
+    regressions = []
+    for r in results:
+        old = previous.get((r["case"], r["rows"]))
+        if old is None:
+            continue
+        for metric, value, old_value, tolerance in [
+            ("time", r["build_s"] + r["serialize_s"], old["build_s"] + old["serialize_s"], min_seconds),
+            ("spec_bytes", r["spec_bytes"], old["spec_bytes"], 0),
+        ]:
+            if value > old_value*(1 + threshold) and value - old_value > tolerance:
+                regressions.append((r["case"], r["rows"], metric, old_value, value))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1e3, 1e4, 1e5, 1e6, 1e7])
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=sorted(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--validate", action="store_true", help="validate specs against the schema when serializing")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative increase reported as a regression")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="smallest time increase reported as a regression")
+    args = parser.parse_args()
+
+    alt.data_transformers.disable_max_rows()
+    results = run(args.cases, args.sizes, args.repeat, args.validate)
+
+    with open(args.output, "w") as f:
+        json.dump(dict(
+            created=time.strftime("%Y-%m-%dT%H:%M:%S"),
+            python=platform.python_version(), platform=platform.platform(),
+            versions=dict(numpy=np.__version__, pandas=pd.__version__, altair=alt.__version__),
+            results=results,
+        ), f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold, args.min_seconds)
+        for case, rows, metric, old, new in regressions:
+            print("regression: %s at %d rows, %s %.4g -> %.4g" % (case, rows, metric, old, new))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
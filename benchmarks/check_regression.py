@@ -0,0 +1,74 @@
+"""Compare the batched regression fits with seaborn's on data with offset x.
+
+Fits seaborn_altair.regression.fit_regression and seaborn's _RegressionPlotter
+on the same data, and fails if the fitted curves differ by more than --tol
+times the width of seaborn's confidence band, or the bands by more than
+--band-tol times it. The bootstraps draw different resamples, so bands only
+agree up to sampling noise. seaborn itself loses precision at the largest
+offsets, so polynomial fits are compared with its fit of x minus the offset,
+which is the same curve shifted.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+# Run from a checkout, without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from seaborn_altair.regression import fit_regression
+
+# name: (x offset, fit keywords)
+CASES = [
+    ("linear", 0, dict()),
+    ("linear_1e5", 1e5, dict()),
+    ("linear_1e6", 1e6, dict()),
+    ("linear_epoch", 1.5e9, dict()),
+    ("order2_1e5", 1e5, dict(order=2)),
+    ("logx_1e5", 1e5, dict(logx=True)),
+    ("logx_epoch", 1.5e9, dict(logx=True)),
+]
+
+def make_data(offset, n, seed):
+    rng = np.random.RandomState(seed)
+    x = offset + rng.uniform(0, 1000, n)
+    y = 0.002*(x - offset) + rng.randn(n)
+    return x, y
+
+def check(offset, kws, n, n_boot, seed):
+    from seaborn.regression import _RegressionPlotter
+    x, y = make_data(offset, n, seed)
+    x_range = (x.min(), x.max())
+    grid, yhat, bands = fit_regression(x, y, x_range, n_boot=n_boot, seed=seed, **kws)
+    shift = 0 if kws.get("logx") else offset
+    p = _RegressionPlotter(x - shift, y, n_boot=n_boot, seed=seed, **kws)
+    sns_grid, sns_yhat, sns_bands = p.fit_regression(x_range=(x_range[0] - shift, x_range[1] - shift))
+    sns_grid = sns_grid + shift
+    width = np.mean(sns_bands[1] - sns_bands[0])
+    assert np.allclose(grid, sns_grid)
+    return (
+        np.max(np.abs(yhat - sns_yhat)) / width,
+        np.max(np.abs(bands - sns_bands)) / width,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--n-boot", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tol", type=float, default=1e-6, help="largest curve difference, relative to the band width")
+    parser.add_argument("--band-tol", type=float, default=0.25, help="largest band difference, relative to the band width")
+    args = parser.parse_args()
+
+    failed = False
+    for name, offset, kws in CASES:
+        yhat_err, band_err = check(offset, kws, args.rows, args.n_boot, args.seed)
+        ok = yhat_err <= args.tol and band_err <= args.band_tol
+        failed = failed or not ok
+        print("%-14s yhat %.2e  bands %.3f  %s" % (name, yhat_err, band_err, "ok" if ok else "FAILED"))
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
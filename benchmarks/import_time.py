@@ -0,0 +1,53 @@
+"""Time `import seaborn_altair` in fresh interpreters.
+
+Fails if the import takes longer than --max-seconds, or if it pulls in modules
+that should only be imported when needed (seaborn, matplotlib, IPython).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+LAZY_MODULES = ["seaborn", "matplotlib", "IPython"]
+
+SCRIPT = """
+import json, sys, time
+start = time.time()
+import seaborn_altair
+elapsed = time.time() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % LAZY_MODULES
+
+def time_import(repeat):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([root, env.get("PYTHONPATH", "")]).rstrip(os.pathsep)
+    results = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, "-c", SCRIPT], env=env)
+        results.append(json.loads(output.decode("utf-8").strip().splitlines()[-1]))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="number of fresh interpreters")
+    parser.add_argument("--max-seconds", type=float, default=None, help="fail above this import time")
+    args = parser.parse_args()
+
+    results = time_import(args.repeat)
+    best = min(r["seconds"] for r in results)
+    loaded = sorted(set(m for r in results for m in r["loaded"]))
+    print("import seaborn_altair: %.3fs (best of %d)" % (best, args.repeat))
+
+    failed = False
+    if loaded:
+        print("eagerly imported: %s" % ", ".join(loaded))
+        failed = True
+    if args.max_seconds is not None and best > args.max_seconds:
+        print("slower than %.3fs" % args.max_seconds)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,15 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
 import os
 import markdown
 
+import nb2html
+
+# Notebook hashes of the last build, kept out of the published docs directory
+MANIFEST = ".docgen_manifest.json"
+
 index_content = """
 <!DOCTYPE html>
 <html>
@@ -32,12 +41,65 @@ index_content = """
 </html>
 """
 
-with open('README.md') as readme:
-    with open('docs/index.html', 'w') as index:
-        md = readme.read().replace('```python', '```')
-        index.write(index_content % markdown.markdown(md))
+def content_hash(path):
+    """Hash of a notebook and of the converter, which both determine its page."""
+    h = hashlib.md5()
+    for p in [path, nb2html.__file__.replace(".pyc", ".py")]:
+        with open(p, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+def render(task):
+    notebook, output = task
+    nb2html.convert(notebook, output)
+    return notebook
+
+def load_manifest():
+    if not os.path.exists(MANIFEST):
+        return {}
+    with open(MANIFEST) as f:
+        return json.load(f)
+
+def save_manifest(manifest):
+    tmp = MANIFEST + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.rename(tmp, MANIFEST)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the HTML documentation from README.md and the notebooks")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of processes, all cores by default")
+    parser.add_argument("--force", action="store_true", help="render notebooks even if they did not change")
+    args = parser.parse_args()
+
+    with open('README.md') as readme:
+        with open('docs/index.html', 'w') as index:
+            md = readme.read().replace('```python', '```')
+            index.write(index_content % markdown.markdown(md))
+
+    manifest = {} if args.force else load_manifest()
+    hashes = {}
+    tasks = []
+    for p in sorted(os.listdir('./notebooks')):
+        sp = os.path.splitext(p)
+        if sp[1] == '.ipynb':
+            notebook = 'notebooks/%s.ipynb' % sp[0]
+            output = 'docs/%s.html' % sp[0]
+            hashes[notebook] = content_hash(notebook)
+            if manifest.get(notebook) != hashes[notebook] or not os.path.exists(output):
+                tasks.append((notebook, output))
+
+    if len(tasks) > 1 and args.jobs != 1:
+        pool = multiprocessing.Pool(args.jobs)
+        try:
+            rendered = pool.map(render, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        rendered = [render(task) for task in tasks]
 
-for p in os.listdir('./notebooks'):
-    sp = os.path.splitext(p)
-    if sp[1] == '.ipynb':
-        os.system('python scripts/nb2html.py notebooks/%s.ipynb docs/%s.html' % (sp[0], sp[0]))
+    for notebook in rendered:
+        print("rendered %s" % notebook)
+    print("%d of %d notebooks up to date" % (len(hashes) - len(rendered), len(hashes)))
+    save_manifest(hashes)
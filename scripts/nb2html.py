@@ -1,5 +1,7 @@
+import argparse
+import hashlib
 import json
-import sys
+import os
 import markdown
 
 header = """
@@ -30,30 +32,125 @@ header = """
 <body>
 """
 
-vis = """
+# Specs are streamed to the output between the two halves of the template
+vis_start = """
   <div id="%s"></div>
   <script type="text/javascript">
-    var spec = %s;
+    var spec = """
+
+vis_end = """;%s
     var opt = {"renderer": "canvas", "actions": false};
     vegaEmbed("#%s", spec, opt);
   </script>
 """
 
+vis_datasets = """
+    spec.datasets = {%s};"""
+
+# Datasets used by several charts of a page are written once, before their first use
+datasets_start = """
+  <script type="text/javascript">
+    var DATASETS = {};
+  </script>
+"""
+
+dataset = """
+  <script type="text/javascript">
+    DATASETS["%s"] = %s;
+  </script>
+"""
+
 footer = """
 </body>
 </html>
 """
 
-if __name__ == "__main__":
-    with open(sys.argv[1]) as inp:
+def write_values(values, data_dir, url_prefix):
+    """Write inline data values to a content-addressed file and return its URL data."""
+    text = json.dumps(values, separators=(",", ":"))
+    name = hashlib.md5(text.encode("utf-8")).hexdigest() + ".json"
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        with open(path, "w") as f:
+            f.write(text)
+    return {"url": "%s/%s" % (url_prefix, name), "format": {"type": "json"}}
+
+def externalize_data(spec, data_dir, url_prefix):
+    """Replace the inline data and named datasets of a spec by shared data files."""
+    urls = {}
+    for name, values in spec.pop("datasets", {}).items():
+        urls[name] = write_values(values, data_dir, url_prefix)
+
+    def visit(node):
+        if isinstance(node, dict):
+            data = node.get("data")
+            if isinstance(data, dict) and "values" in data:
+                node["data"] = write_values(data["values"], data_dir, url_prefix)
+            elif isinstance(data, dict) and data.get("name") in urls:
+                node["data"] = urls[data["name"]]
+            for value in node.values():
+                visit(value)
+        elif isinstance(node, list):
+            for value in node:
+                visit(value)
+
+    visit(spec)
+    return spec
+
+def shared_name(values, shared, out):
+    """Name of a dataset in the page's DATASETS object, writing it there on first use."""
+    text = json.dumps(values)
+    name = "data-%s" % hashlib.md5(text.encode("utf-8")).hexdigest()
+    if name not in shared:
+        if not shared:
+            out.write(datasets_start)
+        out.write(dataset % (name, text))
+        shared.add(name)
+    return name
+
+def share_data(spec, shared, out):
+    """Replace the inline data and named datasets of a spec by references to shared datasets.
+
+    Returns the names of the shared datasets the spec uses.
+    """
+    renames = {}
+    for name, values in spec.pop("datasets", {}).items():
+        renames[name] = shared_name(values, shared, out)
+    used = set(renames.values())
+
+    def visit(node):
+        if isinstance(node, dict):
+            data = node.get("data")
+            if isinstance(data, dict) and "values" in data:
+                name = shared_name(data["values"], shared, out)
+                node["data"] = dict([(k, v) for k, v in data.items() if k != "values"], name=name)
+                used.add(name)
+            elif isinstance(data, dict) and data.get("name") in renames:
+                node["data"] = dict(data, name=renames[data["name"]])
+            for value in node.values():
+                visit(value)
+        elif isinstance(node, list):
+            for value in node:
+                visit(value)
+
+    visit(spec)
+    return sorted(used)
+
+def convert(notebook, output=None, data_dir=None):
+    """Write the HTML page of a notebook, returning its path."""
+    with open(notebook) as inp:
         nb = json.load(inp)
 
-    if len(sys.argv) > 2:
-        outf = sys.argv[2]
-    else:
-        outf = sys.argv[1].split(".")[0] + ".html"
+    if output is None:
+        output = notebook.split(".")[0] + ".html"
+
+    if data_dir:
+        if not os.path.isdir(data_dir):
+            os.makedirs(data_dir)
+        url_prefix = os.path.relpath(data_dir, os.path.dirname(output) or ".").replace(os.sep, "/")
 
-    with open(outf, "w") as out:
+    shared = set()
+    with open(output, "w") as out:
         out.write(header)
         for i, c in enumerate(nb["cells"]):
             if c["cell_type"] == "markdown":
@@ -66,10 +163,28 @@ if __name__ == "__main__":
                         vg = o["data"].get("application/vnd.vegalite.v2+json")
                         img = o["data"].get("image/png")
                         if vg:
+                            datasets = ""
+                            if data_dir:
+                                vg = externalize_data(vg, data_dir, url_prefix)
+                            else:
+                                names = share_data(vg, shared, out)
+                                if names:
+                                    datasets = vis_datasets % ", ".join('"%s": DATASETS["%s"]' % (n, n) for n in names)
                             visid = "vis%s" % i
-                            out.write(vis % (visid, json.dumps(vg), visid))
+                            out.write(vis_start % visid)
+                            json.dump(vg, out)
+                            out.write(vis_end % (datasets, visid))
                         elif img:
                             out.write("<img src=data:image/png;base64,%s>" % img)
 
         out.write(footer)
+    return output
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a notebook with Vega-Lite outputs to HTML")
+    parser.add_argument("notebook")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument("--data-dir", help="write chart data to files in this directory instead of inlining it")
+    args = parser.parse_args()
 
+    convert(args.notebook, args.output, args.data_dir)
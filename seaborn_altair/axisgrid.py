@@ -1,19 +1,73 @@
+import json
+
 import altair as alt
-from IPython.display import display
 import pandas as pd
 
-from .util import size_chart
+from .datasets import default_data_options, prepare_data, subcharts
+from .profiling import entry_point
+from .util import parallel_map, partition, size_chart
 
 __all__ = ["FacetGrid"]
 
+def _plot_part(task):
+    func, args, kwargs = task
+    return func(*args, **kwargs)
+
+def _data_nodes(chart, path=()):
+    """Charts holding a DataFrame in chart and its sub-charts, keyed by their position."""
+    nodes = {}
+    if isinstance(getattr(chart, "data", None), pd.DataFrame):
+        nodes[path] = chart
+    for i, child in enumerate(subcharts(chart)):
+        nodes.update(_data_nodes(child, path + (i,)))
+    return nodes
+
+def _push_data_down(chart):
+    """Move the data of layer charts to their layers, which inherit it, so layers hold their own data."""
+    if isinstance(chart, alt.LayerChart):
+        if isinstance(chart.data, pd.DataFrame):
+            for layer in chart.layer:
+                if layer.data is alt.Undefined:
+                    layer.data = chart.data
+            chart.data = alt.Undefined
+        for layer in chart.layer:
+            _push_data_down(layer)
+    return chart
+
+def _layer_signature(chart):
+    """Spec of a chart and its sub-charts without their data, identifying its layer across facets."""
+    nodes = list(_data_nodes(chart).values())
+    data = [node.data for node in nodes]
+    for node in nodes:
+        node.data = alt.Undefined
+    try:
+        spec = chart.to_dict(validate=False)
+    finally:
+        for node, d in zip(nodes, data):
+            node.data = d
+    for key in ["$schema", "config", "datasets"]:
+        spec.pop(key, None)
+    return json.dumps(spec, sort_keys=True)
+
 class FacetGrid():
-    """Subplot grid for plotting conditional relationships."""
+    """Subplot grid for plotting conditional relationships.
+
+    With partitioned=True, the data is split by row and col in Python and the
+    mapped plot reduces each facet on its own, possibly on n_jobs processes or
+    an executor, so that only the reduced data is embedded in the spec.
+    """
 
-    def __init__(self, data, row=None, col=None, hue=None, palette=None, height=3, aspect=1):
+    def __init__(self, data, row=None, col=None, hue=None, palette=None, height=3, aspect=1, partitioned=False, n_jobs=None, executor=None):
+        self.data = data
+        self.row = row
+        self.col = col
         self.hue = hue
         self.palette = palette
         self.height = height
         self.aspect = aspect
+        self.partitioned = partitioned
+        self.n_jobs = n_jobs
+        self.executor = executor
 
         self.chart = alt.Chart(data).mark_point()
 
@@ -26,20 +80,33 @@ class FacetGrid():
             self.chart = self.chart.facet(**facets)
 
     def _ipython_display_(self):
+        from IPython.display import display
         display(self.chart)
 
+    @entry_point
     def map(self, func, *args, **kwargs):
-        raise ValueError('FacetGrid.map is not implemented. Use map_dataframe instead.')
+        """Plot func(*columns) in each facet, where args name the columns passed as vectors."""
+        if self.hue is not None:
+            raise ValueError('FacetGrid.map does not support hue. Use map_dataframe instead.')
+        plot_kwargs = dict(palette=self.palette, size=self.height, aspect=self.aspect)
+        plot_kwargs.update(kwargs)
+        return self._map_partitions(func, args, plot_kwargs, vectors=True)
 
+    @entry_point
     def map_dataframe(self, func, *args, **kwargs):
         plot_kwargs = dict(
             color=self.hue,
             palette=self.palette, size=self.height,
-            aspect=self.aspect, data=self.chart.data
+            aspect=self.aspect, data=self.data
         )
         plot_kwargs.update(kwargs)
 
-        single = func(*args, **plot_kwargs)
+        if self.partitioned:
+            return self._map_partitions(func, args, plot_kwargs)
+
+        # Data options apply to the faceted chart, not to the chart it repeats
+        with default_data_options():
+            single = func(*args, **plot_kwargs)
 
         if isinstance(self.chart, alt.FacetChart):
             if isinstance(single, alt.FacetChart):
@@ -47,8 +114,90 @@ class FacetGrid():
             self.chart.config = single.config
             single.config = alt.Undefined
             single.data = alt.Undefined
+            self.chart.data = self.data
             self.chart.spec = single
         else:
             self.chart = single
 
+        prepare_data(self.chart)
         return self
+
+    def _map_partitions(self, func, args, kwargs, vectors=False):
+        facets = [f for f in [self.row, self.col] if f is not None]
+        groups = partition(self.data, facets) if facets else {(): self.data}
+        keys = list(groups)
+
+        tasks = []
+        for key in keys:
+            part = groups[key]
+            if vectors:
+                tasks.append((func, tuple(part[a] for a in args), kwargs))
+            else:
+                tasks.append((func, args, dict(kwargs, data=part)))
+
+        # Data options apply to the combined chart, not to each facet
+        with default_data_options():
+            charts = parallel_map(_plot_part, tasks, n_jobs=self.n_jobs, executor=self.executor)
+
+        if not facets:
+            self.chart = charts[0]
+        else:
+            if any(isinstance(c, alt.FacetChart) for c in charts):
+                raise ValueError("Cannot facet a FacetChart")
+            single, data = self._combine(charts, keys, facets)
+            self.chart.config = single.config
+            single.config = alt.Undefined
+            self.chart.data = data
+            self.chart.spec = single
+
+        prepare_data(self.chart)
+        return self
+
+    def _combine(self, charts, keys, facets):
+        """Merge the per-facet charts into one spec and the long data it is faceted over.
+
+        When the charts have several layers with data of their own, their rows
+        are tagged with a facet_layer column each layer filters on. Layers are
+        matched to those of the chart with the most layers by their spec,
+        so that facets may lack some of them.
+        """
+        nodes = [_data_nodes(c) for c in charts]
+        if len(set(tuple(sorted(n)) for n in nodes)) > 1:
+            # Layers may share data held by their layer chart in some facets only
+            nodes = [_data_nodes(_push_data_down(c)) for c in charts]
+        template = max(range(len(charts)), key=lambda i: len(nodes[i]))
+        paths = sorted(nodes[template])
+        signatures = [_layer_signature(nodes[template][path]) for path in paths]
+
+        frames = []
+        for key, node in zip(keys, nodes):
+            unused = list(range(len(paths)))
+            for path in sorted(node):
+                signature = _layer_signature(node[path])
+                matches = [i for i in unused if signatures[i] == signature]
+                if not matches:
+                    raise ValueError("The plots of the facets do not have the same layers")
+                # Identical layers are matched in order, preferring the same position
+                layer = next((i for i in matches if paths[i] == path), matches[0])
+                unused.remove(layer)
+                frame = node[path].data.copy()
+                for facet, value in zip(facets, key):
+                    frame[facet] = value
+                if len(paths) > 1:
+                    frame["facet_layer"] = layer
+                frames.append(frame)
+
+        for layer, path in enumerate(paths):
+            chart = nodes[template][path]
+            chart.data = alt.Undefined
+            if len(paths) > 1:
+                transform = [alt.FilterTransform(filter="datum.facet_layer == %d" % layer)]
+                if chart.transform is not alt.Undefined:
+                    transform += list(chart.transform)
+                chart.transform = transform
+
+        if frames:
+            data = pd.concat(frames, ignore_index=True, sort=False)
+        else:
+            data = self.data.iloc[:0]
+        return charts[template], data
@@ -0,0 +1,229 @@
+from collections import OrderedDict
+import hashlib
+import json
+import glob
+import inspect
+import os
+import threading
+
+import altair as alt
+import numpy as np
+import pandas as pd
+import six
+
+from .axisgrid import FacetGrid
+from .datasets import fingerprint, options
+from .util import write_atomic
+
+_sources_digest = None
+
+def _library_version():
+    """Digest of the package sources, so that specs cached on disk expire with the code building them."""
+    global _sources_digest
+    if _sources_digest is None:
+        digest = hashlib.md5()
+        for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        _sources_digest = digest.hexdigest()
+    return _sources_digest
+
+def _global_state():
+    """Settings read while building charts, besides the plot arguments."""
+    import matplotlib as mpl
+    data_options = []
+    for name, value in sorted(six.iteritems(options)):
+        if hasattr(value, "__dict__") and not isinstance(value, type):
+            # Transports are described by their settings, not their identity
+            value = (type(value).__name__, _normalize(vars(value)))
+        data_options.append((name, _normalize(value)))
+    return (
+        _library_version(), alt.__version__, tuple(data_options),
+        mpl.rcParams["figure.dpi"],
+        tuple(mpl.rcParams["axes.prop_cycle"].by_key().get("color", [])),
+    )
+
+def _bind(func, args, kwargs):
+    """Arguments of a call by parameter name, with defaults, so that equivalent calls describe alike."""
+    try:
+        if hasattr(inspect, "signature"):
+            bound = inspect.signature(func).bind(*args, **kwargs)
+            bound.apply_defaults()
+            return dict(bound.arguments)
+        return inspect.getcallargs(func, *args, **kwargs)
+    except (TypeError, ValueError):
+        # Not introspectable, or a call func would reject
+        return dict(enumerate(args), **kwargs)
+
+def _normalize(value):
+    """Hashable description of a plot argument, equal for equal content."""
+    if isinstance(value, pd.DataFrame):
+        return ("DataFrame", fingerprint(value, index=True))
+    if isinstance(value, pd.Series):
+        return ("Series", repr(value.name), fingerprint(value.to_frame(), index=True))
+    if isinstance(value, np.ndarray):
+        digest = hashlib.md5(pd.util.hash_array(np.ravel(value)).tobytes()).hexdigest()
+        return ("ndarray", str(value.dtype), value.shape, digest)
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted((repr(k), _normalize(v)) for k, v in six.iteritems(value))))
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(_normalize(v) for v in value))
+    if isinstance(value, alt.SchemaBase):
+        return (type(value).__name__, json.dumps(value.to_dict(validate=False), sort_keys=True))
+    if callable(value):
+        # Decorated functions share their wrapper's code
+        while hasattr(value, "__wrapped__"):
+            value = value.__wrapped__
+        # Lambdas and closures share names, so their bytecode is part of the key
+        code = getattr(value, "__code__", None)
+        body = None
+        if code is not None:
+            consts = [c for c in code.co_consts if not hasattr(c, "co_code")]
+            body = hashlib.md5(code.co_code + repr(consts).encode("utf-8")).hexdigest()
+        return ("callable", getattr(value, "__module__", None), getattr(value, "__name__", repr(value)), body)
+    return repr(value)
+
+class SpecCache(object):
+    """Cache of serialized Vega-Lite specs keyed on plot function, arguments and data content.
+
+    Entries are evicted least recently used first once there are more than
+    max_entries or their total size exceeds max_bytes. If directory is set,
+    specs are also written there and read back on in-memory misses, the same
+    limits applying to the files. Calls passing the same arguments
+    positionally, by keyword or as defaults share their key, which also
+    covers the data options, the matplotlib settings charts depend on and the
+    versions of altair and this package.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=None, directory=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self._lock = threading.Lock()
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def key(self, func, *args, **kwargs):
+        arguments = _bind(func, args, kwargs)
+        description = repr((
+            _global_state(), _normalize(func),
+            tuple(sorted((repr(k), _normalize(v)) for k, v in six.iteritems(arguments)))
+        ))
+        return hashlib.md5(description.encode("utf-8")).hexdigest()
+
+    def to_json(self, func, *args, **kwargs):
+        """Serialized spec of func(*args, **kwargs), built only on cache misses."""
+        key = self.key(func, *args, **kwargs)
+        with self._lock:
+            spec = self.entries.get(key)
+            if spec is not None:
+                self.entries[key] = self.entries.pop(key)
+                self.hits += 1
+                return spec
+
+        spec = self._read(key)
+        if spec is not None:
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            chart = func(*args, **kwargs)
+            if isinstance(chart, FacetGrid):
+                chart = chart.chart
+            spec = json.dumps(chart.to_dict(), sort_keys=True)
+            self._write(key, spec)
+            with self._lock:
+                self.misses += 1
+
+        self._store(key, spec)
+        return spec
+
+    def to_dict(self, func, *args, **kwargs):
+        return json.loads(self.to_json(func, *args, **kwargs))
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                hits=self.hits, disk_hits=self.disk_hits, misses=self.misses,
+                evictions=self.evictions, disk_evictions=self.disk_evictions, entries=len(self.entries), bytes=self.nbytes
+            )
+
+    def clear(self, disk=False):
+        with self._lock:
+            self.entries.clear()
+            self.nbytes = 0
+        if disk and self.directory is not None:
+            for path, _, _ in self._files():
+                os.remove(path)
+
+    def _store(self, key, spec):
+        with self._lock:
+            if key in self.entries:
+                return
+            self.entries[key] = spec
+            self.nbytes += len(spec)
+            while self.entries and (
+                len(self.entries) > self.max_entries or
+                (self.max_bytes is not None and self.nbytes > self.max_bytes)
+            ):
+                _, evicted = self.entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+                self.evictions += 1
+
+    def _path(self, key):
+        return os.path.join(self.directory, "%s.json" % key)
+
+    def _read(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                spec = f.read()
+            os.utime(self._path(key), None)
+        except (IOError, OSError):
+            # Missing, or evicted by another process sharing the directory
+            return None
+        return spec
+
+    def _write(self, key, spec):
+        if self.directory is None:
+            return
+        def write(path):
+            with open(path, "w") as f:
+                f.write(spec)
+        write_atomic(self._path(key), write)
+        self._evict_files(keep=self._path(key))
+
+    def _files(self):
+        """Cached spec files as (path, size, last use) tuples, least recently used first."""
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                path = os.path.join(self.directory, name)
+                st = os.stat(path)
+                files.append((path, st.st_size, st.st_mtime))
+        return sorted(files, key=lambda f: f[2])
+
+    def _evict_files(self, keep=None):
+        files = self._files()
+        count = len(files)
+        total = sum(f[1] for f in files)
+        for path, size, _ in files:
+            if path == keep:
+                continue
+            if count > self.max_entries or (self.max_bytes is not None and total > self.max_bytes):
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Removed by another process sharing the directory
+                    pass
+                count -= 1
+                total -= size
+                with self._lock:
+                    self.disk_evictions += 1
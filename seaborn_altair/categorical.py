@@ -1,14 +1,17 @@
 import numpy as np
 import altair as alt
 import pandas as pd
-from .util import infer_orient, size_chart, vega_color, vega_palette
+from .chunked import chunked_source, group_counts, group_moments, group_quantiles, is_chunked, iter_chunks, peek
+from .datasets import prepare_data
+from .profiling import entry_point, timed
+from .util import build_dataframe, infer_orient, size_chart, vega_color, vega_palette
 from .axisgrid import FacetGrid
 
 __all__ = ["boxplot", "catplot", "stripplot", "pointplot", "barplot", "countplot"]
 
-def _bar_encodings(x, y, xs, ys, hue, dodge, estimator):
+def _bar_encodings(x, y, xs, ys, hue, dodge, estimator, field=None):
     encodings = {
-        ys: alt.Y(field=y, aggregate=estimator, type="quantitative", axis={"title": y}),
+        ys: alt.Y(field=field or y, aggregate=estimator, type="quantitative", axis={"title": y}),
         "color": alt.Color(field=x ,type="nominal", legend=None)
     }
 
@@ -20,19 +23,16 @@ def _bar_encodings(x, y, xs, ys, hue, dodge, estimator):
     encodings[xs] = alt.X(field=xf, type="nominal")
     return encodings
 
-def _bar_ci_encodings(x, y, xs, ys, hue, dodge, estimator):
-    encodings = {
-        ys: alt.Y(field=y, aggregate="ci0", type="quantitative"),
-        "%s2" % ys: alt.Y(field=y, aggregate="ci1", type="quantitative")
-    }
+def _bar_ci_encodings(x, y, xs, ys, hue, dodge, estimator, ci_fields=None):
+    encodings = _ci_encodings(y, ys, ci_fields)
 
     xf = hue if hue and dodge else x
     encodings[xs] = alt.X(field=xf, type="nominal")
     return encodings
 
-def _point_encodings(x, y, xs, ys, hue, estimator):
+def _point_encodings(x, y, xs, ys, hue, estimator, field=None):
     encodings = {
-        ys: alt.Y(field=y, aggregate=estimator, type="quantitative"),
+        ys: alt.Y(field=field or y, aggregate=estimator, type="quantitative"),
         "color": alt.Color(field="___" ,type="nominal", legend=None)
     }
 
@@ -42,14 +42,98 @@ def _point_encodings(x, y, xs, ys, hue, estimator):
     encodings[xs] = alt.X(field=x, type="nominal")
     return encodings
 
-def _point_ci_encodings(x, y, xs, ys, hue, estimator):
-    encodings = {
+def _point_ci_encodings(x, y, xs, ys, hue, estimator, ci_fields=None):
+    encodings = _ci_encodings(y, ys, ci_fields)
+
+    encodings[xs] = alt.X(field=x, type="nominal")
+    return encodings
+
+def _ci_encodings(y, ys, ci_fields=None):
+    if ci_fields:
+        return {
+            ys: alt.Y(field=ci_fields[0], type="quantitative"),
+            "%s2" % ys: alt.Y(field=ci_fields[1], type="quantitative")
+        }
+    return {
         ys: alt.Y(field=y, aggregate="ci0", type="quantitative"),
         "%s2" % ys: alt.Y(field=y, aggregate="ci1", type="quantitative")
     }
 
-    encodings[xs] = alt.X(field=x, type="nominal")
-    return encodings
+def _resolve_chunked(data, aggregate):
+    """(sample, data, aggregate) to plot data with.
+
+    Chunked sources are always aggregated here, orientation and types are
+    inferred from their first chunk, the sample.
+    """
+    data = chunked_source(data)
+    if not is_chunked(data):
+        return data, data, aggregate
+    sample, data = peek(data)
+    return sample, data, "server"
+
+def _validate_aggregate(aggregate):
+    if aggregate not in ["client", "server"]:
+        raise ValueError("aggregate must be client or server")
+    return aggregate
+
+def _chunked_estimate(data, keys, y, estimator):
+    """Estimate and standard error of the mean per group, merged over the chunks of data."""
+    if estimator == "count":
+        return group_counts(data, keys), None
+    if estimator == "median":
+        return group_quantiles(data, keys, y, [.5])[.5], None
+    moments = group_moments(data, keys, y)
+    sem = np.sqrt(moments["m2"] / (moments["count"] - 1) / moments["count"])
+    return moments["mean"], sem
+
+@timed("aggregate")
+def _server_aggregate(data, x, y, hue, estimator, ci):
+    """Reduce data, a DataFrame or chunked source, to one row per (x, hue) group holding the estimate and CI."""
+    keys = [x] if hue is None or hue == x else [x, hue]
+    field = "count" if y in keys else y
+
+    if is_chunked(data):
+        values, sem = _chunked_estimate(data, keys, y, estimator)
+    else:
+        grouped = data.groupby(keys, sort=False)
+        if estimator == "count":
+            values = grouped.size()
+        elif estimator == "median":
+            values = grouped[y].median()
+        else:
+            values = grouped[y].mean()
+        sem = grouped[y].sem() if ci else None
+    agg = pd.DataFrame({field: values})
+
+    ci_fields = None
+    if ci:
+        # Normal approximation of the 95% interval of the mean
+        ci_fields = ("%s_ci0" % field, "%s_ci1" % field)
+        err = 1.959964 * sem
+        agg[ci_fields[0]] = values - err
+        agg[ci_fields[1]] = values + err
+
+    return agg.reset_index(), field, ci_fields
+
+@timed("aggregate")
+def _box_stats(data, x, y, hue):
+    """Reduce data, a DataFrame or chunked source, to the five-number summary of y per (x, hue) group."""
+    keys = [k for k in [x, hue] if k is not None]
+    keys = sorted(set(keys), key=keys.index)
+    names = ["min", "q1", "median", "q3", "max"]
+    quantiles = [0, .25, .5, .75, 1]
+
+    if is_chunked(data):
+        # Quantiles are approximated by sketches, except for min and max
+        summary = group_quantiles(data, keys, y, quantiles)
+    elif keys:
+        summary = data.groupby(keys, sort=False)[y].quantile(quantiles).unstack()
+    else:
+        summary = data[y].quantile(quantiles).to_frame().T
+
+    stats = dict((name, "%s_%s" % (y, name)) for name in names)
+    summary.columns = [stats[name] for name in names]
+    return summary.reset_index(drop=not keys), stats
 
 def _validate_estimator(estimator, ci):
     if estimator in ["mean", np.mean]:
@@ -68,24 +152,32 @@ def _validate_estimator(estimator, ci):
         raise ValueError("estimator must be mean or median")
     return estimator
 
+@entry_point
 def barplot(
     x=None, y=None, hue=None, data=None,
     estimator=np.mean, ci=95, size=None, aspect=1,
-    orient=None, color=None, palette=None, saturation=.75, dodge=True
+    orient=None, color=None, palette=None, saturation=.75, dodge=True,
+    aggregate="client"
 ):
     xs, ys = "x", "y"
-    orient = infer_orient(data[x], data[y], orient)
+    sample, data, aggregate = _resolve_chunked(data, aggregate)
+    orient = infer_orient(x, y, orient, data=sample)
     if orient == "h":
         x, y = y, x
         xs, ys = ys, xs
 
     estimator = _validate_estimator(estimator, ci)
 
-    encodings = _bar_encodings(x, y, xs, ys, hue, dodge, estimator)
+    field, ci_fields = None, None
+    if _validate_aggregate(aggregate) == "server":
+        data, field, ci_fields = _server_aggregate(data, x, y, hue, estimator, ci)
+        estimator = alt.Undefined
+
+    encodings = _bar_encodings(x, y, xs, ys, hue, dodge, estimator, field)
     chart = alt.Chart(data).mark_bar().encode(**encodings)
 
     if ci:
-        ci_encodings = _bar_ci_encodings(x, y, xs, ys, hue, dodge, estimator)
+        ci_encodings = _bar_ci_encodings(x, y, xs, ys, hue, dodge, estimator, ci_fields)
         ci_layer = alt.Chart().mark_rule().encode(**ci_encodings)
         chart.data = alt.Undefined
         chart = alt.LayerChart(data=data, layer=[chart, ci_layer])
@@ -97,11 +189,13 @@ def barplot(
     size_chart(chart, size, aspect)
 
     pal = vega_palette(palette, color, saturation)
-    return chart.configure_range(category=pal)
+    return prepare_data(chart.configure_range(category=pal))
 
+@entry_point
 def countplot(
     x=None, y=None, hue=None, data=None, size=None, aspect=1,
-    orient=None, color=None, palette=None, saturation=.75, dodge=True
+    orient=None, color=None, palette=None, saturation=.75, dodge=True,
+    aggregate="client"
 ):
     estimator = len
     ci = None
@@ -121,23 +215,30 @@ def countplot(
         x, y, hue, data,
         estimator=estimator, ci=ci, size=size, aspect=aspect,
         orient=orient, color=color, palette=palette, saturation=saturation,
-        dodge=dodge,
+        dodge=dodge, aggregate=aggregate,
     )
 
+@entry_point
 def pointplot(
     x=None, y=None, hue=None, data=None,
     estimator=np.mean, ci=95, join=True, size=None, aspect=1,
-    orient=None, color=None, palette=None, saturation=.75
+    orient=None, color=None, palette=None, saturation=.75, aggregate="client"
 ):
     xs, ys = "x", "y"
-    orient = infer_orient(data[x], data[y], orient)
+    sample, data, aggregate = _resolve_chunked(data, aggregate)
+    orient = infer_orient(x, y, orient, data=sample)
     if orient == "h":
         x, y = y, x
         xs, ys = ys, xs
 
     estimator = _validate_estimator(estimator, ci)
 
-    encodings = _point_encodings(x, y, xs, ys, hue, estimator)
+    field, ci_fields = None, None
+    if _validate_aggregate(aggregate) == "server":
+        data, field, ci_fields = _server_aggregate(data, x, y, hue, estimator, ci)
+        estimator = alt.Undefined
+
+    encodings = _point_encodings(x, y, xs, ys, hue, estimator, field)
     chart = alt.Chart(data).mark_circle().encode(**encodings)
     layers = [chart]
 
@@ -145,7 +246,7 @@ def pointplot(
         layers.append(alt.Chart().mark_line().encode(**encodings))
 
     if ci:
-        ci_encodings = _point_ci_encodings(x, y, xs, ys, hue, estimator)
+        ci_encodings = _point_ci_encodings(x, y, xs, ys, hue, estimator, ci_fields)
         cfield = hue if hue else "___"
         ci_encodings["color"] = alt.Color(field=cfield, type="nominal", legend=None)
         layers.append(alt.Chart().mark_rule().encode(**ci_encodings))
@@ -157,23 +258,21 @@ def pointplot(
     size_chart(chart, size, aspect)
 
     pal = vega_palette(palette, color, saturation)
-    return chart.configure_range(category=pal)
+    return prepare_data(chart.configure_range(category=pal))
 
 
+@entry_point
 def stripplot(
     x=None, y=None, hue=None, data=None, size=None, aspect=1,
     dodge=False, orient=None, color=None, palette=None, saturation=.75
 ):
     xs, ys = "x", "y"
     if data is None:
-        data = pd.DataFrame({"x": x})
-        x = "x"
-        if y:
-            data["y"] = y
-            y = "y"
+        data, names = build_dataframe({"x": x, "y": y})
+        x, y = names["x"], names["y"]
 
     if y:
-        orient = infer_orient(data[x], data[y], orient)
+        orient = infer_orient(x, y, orient, data=data)
     else:
         orient = "v"
 
@@ -204,38 +303,38 @@ def stripplot(
     size_chart(chart, size, aspect)
 
     pal = vega_palette(palette, color, saturation)
-    return chart.configure_range(category=pal)
+    return prepare_data(chart.configure_range(category=pal))
 
+@entry_point
 def boxplot(
     x=None, y=None, hue=None, data=None, size=None, aspect=1,
-    orient=None, color=None, palette=None, saturation=.75, dodge=True
+    orient=None, color=None, palette=None, saturation=.75, dodge=True,
+    aggregate="client"
 ):
     xs, ys = "x", "y"
     if data is None:
-        data = pd.DataFrame({"x": x})
-        x = "x"
-        if y:
-            data["y"] = y
-            y = "y"
+        data, names = build_dataframe({"x": x, "y": y})
+        x, y = names["x"], names["y"]
+
+    sample, data, aggregate = _resolve_chunked(data, aggregate)
+    chunked = is_chunked(data)
 
     if x is None and y is None:
         # Make a box plot for each numeric column
-        numeric_cols = [c for c in data if data[c].dtype in [np.float32, np.float64]]
-        col = []
-        val = []
-        for c in numeric_cols:
-            for v in data[c]:
-                col.append(c)
-                val.append(v)
-
-        data = pd.DataFrame({"column": col, "value": val})
+        numeric_cols = [c for c in sample if sample[c].dtype in [np.float32, np.float64]]
+        melt_kws = dict(value_vars=numeric_cols, var_name="column", value_name="value")
+        sample = pd.melt(sample, **melt_kws)
+        if chunked:
+            data = (pd.melt(chunk, **melt_kws) for chunk in iter_chunks(data, numeric_cols))
+        else:
+            data = sample
         x = "column"
         y = "value"
         if orient == "h":
             x, y = y, x
 
     if y:
-        orient = infer_orient(data[x], data[y], orient)
+        orient = infer_orient(x, y, orient, data=sample)
     elif orient is None:
         orient = "h"
 
@@ -245,10 +344,19 @@ def boxplot(
 
     xf = hue if hue and dodge else x
 
+    stats = None
+    if _validate_aggregate(aggregate) == "server":
+        data, stats = _box_stats(data, x, y, hue)
+
+    def stat(name):
+        if stats is None:
+            return dict(field=y, aggregate=name)
+        return dict(field=stats[name])
+
     # Main bar
     encodings = {
-        ys: alt.Y(field=y, aggregate="q1", type="quantitative", axis={"title": y}),
-        "%s2" % ys: alt.Y(field=y, aggregate="q3", type="quantitative"),
+        ys: alt.Y(type="quantitative", axis={"title": y}, **stat("q1")),
+        "%s2" % ys: alt.Y(type="quantitative", **stat("q3")),
         "color": alt.Color(field=x ,type="nominal", legend=None),
         xs: alt.X(field=xf, type="nominal")
     }
@@ -262,8 +370,8 @@ def boxplot(
 
     # Min/max range line
     range_encodings = {
-        ys: alt.Y(field=y, aggregate="min", type="quantitative"),
-        "%s2" % ys: alt.Y(field=y, aggregate="max", type="quantitative"),
+        ys: alt.Y(type="quantitative", **stat("min")),
+        "%s2" % ys: alt.Y(type="quantitative", **stat("max")),
         xs: alt.X(field=xf, type="nominal")
     }
     if x is None:
@@ -272,7 +380,7 @@ def boxplot(
 
     # Median line
     median_encodings = {
-        ys: alt.Y(field=y, aggregate="median", type="quantitative"),
+        ys: alt.Y(type="quantitative", **stat("median")),
         xs: alt.X(field=xf, type="nominal")
     }
     if x is None:
@@ -288,8 +396,9 @@ def boxplot(
     size_chart(chart, size, aspect)
 
     pal = vega_palette(palette, color, saturation)
-    return chart.configure_range(category=pal)
+    return prepare_data(chart.configure_range(category=pal))
 
+@entry_point
 def catplot(
     x=None, y=None, hue=None, data=None, row=None, col=None,
     estimator=np.mean, ci=95, kind="point", height=None, aspect=1,
@@ -306,6 +415,9 @@ def catplot(
     # Determine keyword arguments for the facets
     facet_kws = {} if facet_kws is None else facet_kws
     facet_kws.update(data=data, row=row, col=col, height=height, aspect=aspect)
+    if kwargs.get("aggregate") == "server":
+        # Aggregated facets only hold their own groups
+        facet_kws.setdefault("partitioned", True)
 
     # Determine keyword arguments for the plotting function
     plot_kws = kwargs
@@ -0,0 +1,214 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import six
+
+def _is_parquet(source):
+    if isinstance(source, six.string_types):
+        return source.lower().endswith((".parquet", ".pq"))
+    return hasattr(source, "read_row_group")
+
+class Chunks(object):
+    """Chunks of an iterator whose first chunk was read already, iterable once."""
+
+    def __init__(self, first, rest):
+        self.first = first
+        self.rest = rest
+
+    def __iter__(self):
+        return itertools.chain([self.first], self.rest)
+
+def _is_iterator(data):
+    return hasattr(data, "__next__") or hasattr(data, "next")
+
+def is_chunked(data):
+    """Whether data is a chunked source: a pd.read_csv(chunksize=...) reader,
+    a local Parquet file, a list of DataFrames or arrays, or Chunks."""
+    if isinstance(data, (Chunks, pd.io.parsers.TextFileReader)):
+        return True
+    if isinstance(data, (list, tuple)):
+        # Lists of values are plain data, lists of frames or arrays hold chunks
+        return len(data) > 0 and all(isinstance(c, (pd.DataFrame, pd.Series, np.ndarray)) for c in data)
+    return _is_parquet(data)
+
+def chunked_source(data):
+    """data, as Chunks if it is an iterator of DataFrames or arrays, or as a list if an iterator of values."""
+    if is_chunked(data) or isinstance(data, (pd.DataFrame, pd.Series, np.ndarray)) or not _is_iterator(data):
+        return data
+    try:
+        first = next(data)
+    except StopIteration:
+        return []
+    if isinstance(first, (pd.DataFrame, pd.Series, np.ndarray)):
+        return Chunks(first, data)
+    return [first] + list(data)
+
+def _parquet_file(source):
+    if not isinstance(source, six.string_types):
+        return source
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet files requires pyarrow")
+    return pq.ParquetFile(source)
+
+def iter_chunks(source, columns=None):
+    """DataFrames of a chunked source in turn, reading Parquet files one row group at a time."""
+    if _is_parquet(source):
+        f = _parquet_file(source)
+        for i in range(f.num_row_groups):
+            yield f.read_row_group(i, columns=columns).to_pandas()
+    else:
+        for chunk in source:
+            yield chunk if columns is None else chunk[columns]
+
+def peek(source):
+    """First chunk of source, and the source to read all chunks from afterwards."""
+    if _is_parquet(source):
+        f = _parquet_file(source)
+        first = f.read_row_group(0).to_pandas() if f.num_row_groups else f.schema_arrow.empty_table().to_pandas()
+        return first, f
+    if isinstance(source, Chunks):
+        return source.first, source
+    if isinstance(source, (list, tuple)):
+        return source[0], source
+    chunks = iter(source)
+    try:
+        first = next(chunks)
+    except StopIteration:
+        raise ValueError("The chunked data source is empty")
+    return first, Chunks(first, chunks)
+
+def value_range(source, column):
+    """(min, max) of a column from Parquet statistics, None if they are not available."""
+    if not _is_parquet(source):
+        return None
+    f = _parquet_file(source)
+    index = f.schema_arrow.get_field_index(column)
+    lo, hi = [], []
+    for i in range(f.num_row_groups):
+        stats = f.metadata.row_group(i).column(index).statistics
+        if stats is None or not stats.has_min_max:
+            return None
+        lo.append(stats.min)
+        hi.append(stats.max)
+    if not lo:
+        return None
+    return min(lo), max(hi)
+
+def _group_index(keys, labels):
+    if len(keys) == 1:
+        return pd.Index([label[0] for label in labels], name=keys[0])
+    return pd.MultiIndex.from_tuples(labels, names=keys)
+
+def group_counts(source, keys):
+    """Number of rows of each keys group of a chunked source."""
+    counts = None
+    for chunk in iter_chunks(source, keys):
+        part = chunk.groupby(keys, sort=False).size()
+        counts = part if counts is None else counts.add(part, fill_value=0)
+    return counts.astype(np.int64)
+
+def _merge_moments(a, b):
+    # Chan et al. pairwise update, stable where sum of squares are not
+    both = pd.concat([a, b])
+    levels = list(range(both.index.nlevels))
+    count = both["count"].groupby(level=levels, sort=False).sum()
+    mean = (both["count"]*both["mean"]).groupby(level=levels, sort=False).sum() / count
+    shift = both["mean"].values - mean.reindex(both.index).values
+    m2 = (both["m2"] + both["count"]*shift**2).groupby(level=levels, sort=False).sum()
+    return pd.DataFrame({"count": count, "mean": mean, "m2": m2})
+
+def group_moments(source, keys, y):
+    """Count, mean and sum of squared deviations of y in each keys group of a chunked source."""
+    moments = None
+    for chunk in iter_chunks(source, keys + [y]):
+        grouped = chunk.groupby(keys, sort=False)[y]
+        count = grouped.count()
+        part = pd.DataFrame({
+            "count": count, "mean": grouped.mean(),
+            "m2": (grouped.var(ddof=0)*count).fillna(0),
+        })
+        moments = part if moments is None else _merge_moments(moments, part)
+    return moments
+
+def group_sketches(source, keys, y, size=1000):
+    """QuantileSketch of y in each keys group of a chunked source, or of all rows without keys."""
+    sketches = {}
+    for chunk in iter_chunks(source, keys + [y]):
+        if not keys:
+            sketches.setdefault((), QuantileSketch(size)).update(chunk[y].values)
+            continue
+        for label, values in chunk.groupby(keys, sort=False)[y]:
+            if not isinstance(label, tuple):
+                label = (label,)
+            sketches.setdefault(label, QuantileSketch(size)).update(values.values)
+    return sketches
+
+def group_quantiles(source, keys, y, quantiles, size=1000):
+    """DataFrame of quantiles of y per keys group, with a column per quantile."""
+    sketches = group_sketches(source, keys, y, size)
+    labels = list(sketches)
+    values = [[sketches[label].quantile(q) for q in quantiles] for label in labels]
+    index = _group_index(keys, labels) if keys else None
+    return pd.DataFrame(values, index=index, columns=quantiles)
+
+class QuantileSketch(object):
+    """Mergeable summary of a distribution, with a rank error of about 1/size.
+
+    Values are kept as weighted centroids, merged into about size centroids of
+    equal weight once there are more than 2*size. Up to then, and for the
+    minimum and maximum, quantiles are exact and match pandas' linear ones.
+    """
+
+    def __init__(self, size=1000):
+        self.size = size
+        self.values = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.nan
+        self.max = np.nan
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self._add(values, np.ones(len(values)), values.min(), values.max())
+        return self
+
+    def merge(self, other):
+        if len(other.values):
+            self._add(other.values, other.weights, other.min, other.max)
+        return self
+
+    def _add(self, values, weights, lo, hi):
+        self.values = np.concatenate([self.values, values])
+        self.weights = np.concatenate([self.weights, weights])
+        self.min = np.fmin(self.min, lo)
+        self.max = np.fmax(self.max, hi)
+        if len(self.values) > 2*self.size:
+            self._compress()
+
+    def _compress(self):
+        order = np.argsort(self.values, kind="mergesort")
+        values, weights = self.values[order], self.weights[order]
+        before = np.cumsum(weights) - weights
+        bucket = (before*self.size // weights.sum()).astype(np.int64)
+        totals = np.bincount(bucket, weights=weights)
+        keep = totals > 0
+        self.values = (np.bincount(bucket, weights=values*weights)[keep] / totals[keep])
+        self.weights = totals[keep]
+
+    def quantile(self, q):
+        if not len(self.values):
+            return np.nan
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        order = np.argsort(self.values, kind="mergesort")
+        values, weights = self.values[order], self.weights[order]
+        # Centroid positions in rank, 0 to n - 1 for unit weights as in pandas
+        positions = np.cumsum(weights) - weights/2. - 0.5
+        rank = q*(weights.sum() - 1)
+        return float(np.interp(rank, positions, values, left=self.min, right=self.max))
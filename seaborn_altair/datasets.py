@@ -0,0 +1,240 @@
+from contextlib import contextmanager
+import functools
+import hashlib
+import json
+import re
+import altair as alt
+import numpy as np
+import pandas as pd
+import six
+
+from .profiling import timed
+
+# How charts built by this package embed their data, see data_options
+options = dict(transport=None, dictionary_encode=False, significant_digits=None, drop_index=False)
+_defaults = options.copy()
+
+def set_data_options(**kwargs):
+    unknown = set(kwargs) - set(options)
+    if unknown:
+        raise ValueError("Unknown data options: %s" % ", ".join(sorted(unknown)))
+    options.update(kwargs)
+
+@contextmanager
+def data_options(**kwargs):
+    """Temporarily change how the charts built in this block embed their data.
+
+    transport: a transport.DataStore the data is written to and referenced
+    by URL from, instead of being inlined in the spec.
+    dictionary_encode: replace repeated strings by integer codes, decoded
+    by a lookup transform in the browser, in the columns where it makes
+    the spec smaller.
+    significant_digits: round floats to this number of significant digits.
+    drop_index: drop columns left over from an index, e.g. "index" or
+    "Unnamed: 0", that the chart does not use.
+    """
+    previous = options.copy()
+    set_data_options(**kwargs)
+    try:
+        yield
+    finally:
+        options.clear()
+        options.update(previous)
+
+def default_data_options():
+    """Context manager restoring the default options, for charts combined before being prepared."""
+    return data_options(**_defaults)
+
+def holds_data(func):
+    """Decorator for functions preparing the parts of a chart separately, so
+    that the transport keeps the files of every part until they return."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        transport = options["transport"]
+        if transport is None:
+            return func(*args, **kwargs)
+        with transport.holding():
+            return func(*args, **kwargs)
+    return wrapper
+
+def fingerprint(data, index=False):
+    """Content hash of a DataFrame's values, column names and dtypes."""
+    h = hashlib.md5()
+    h.update(pd.util.hash_pandas_object(data, index=index).values.tobytes())
+    h.update(repr([(str(c), str(t)) for c, t in zip(data.columns, data.dtypes)]).encode("utf-8"))
+    return h.hexdigest()
+
+def subcharts(chart):
+    """Charts directly nested in a layered, concatenated or faceted chart."""
+    children = []
+    for attr in ["layer", "hconcat", "vconcat"]:
+        charts = getattr(chart, attr, alt.Undefined)
+        if charts is not alt.Undefined:
+            children += list(charts)
+    spec = getattr(chart, "spec", alt.Undefined)
+    if spec is not alt.Undefined:
+        children.append(spec)
+    return children
+
+class DatasetRegistry(object):
+    """Named datasets shared by all layers and facets of a chart, stored once per content."""
+
+    def __init__(self):
+        self.datasets = {}
+
+    def add(self, data):
+        name = "data-%s" % fingerprint(data)
+        if name not in self.datasets:
+            self.datasets[name] = alt.utils.data.to_values(data)["values"]
+        return alt.NamedData(name=name)
+
+    def hoist(self, chart):
+        """Replace DataFrames embedded anywhere in chart by references to named datasets."""
+        if isinstance(getattr(chart, "data", None), pd.DataFrame):
+            chart.data = self.add(chart.data)
+        for child in subcharts(chart):
+            self.hoist(child)
+        return chart
+
+def _collect_fields(spec, fields):
+    if isinstance(spec, dict):
+        for key, value in spec.items():
+            if key == "field" and isinstance(value, six.string_types):
+                fields.add(value)
+            elif isinstance(value, six.string_types) and key in ["row", "column"]:
+                fields.add(value.split(":")[0])
+            else:
+                _collect_fields(value, fields)
+    elif isinstance(spec, list):
+        for value in spec:
+            _collect_fields(value, fields)
+
+def referenced_fields(chart):
+    """Fields used by the encodings and facets of chart and its sub-charts.
+
+    Returns None when they cannot be determined, e.g. when transforms are used.
+    """
+    if getattr(chart, "transform", alt.Undefined) is not alt.Undefined:
+        return None
+    fields = set()
+    for attr in ["encoding", "facet"]:
+        spec = getattr(chart, attr, alt.Undefined)
+        if isinstance(spec, alt.SchemaBase):
+            spec = spec.to_dict(validate=False)
+        if spec is not alt.Undefined:
+            _collect_fields(spec, fields)
+    for child in subcharts(chart):
+        child_fields = referenced_fields(child)
+        if child_fields is None:
+            return None
+        fields |= child_fields
+    return fields
+
+def project_columns(chart):
+    """Drop the columns of embedded DataFrames that chart never references."""
+    if isinstance(getattr(chart, "data", None), pd.DataFrame):
+        fields = referenced_fields(chart)
+        if fields is not None and not any("." in f or "[" in f for f in fields - set(chart.data.columns)):
+            columns = [c for c in chart.data.columns if c in fields]
+            if len(columns) < len(chart.data.columns):
+                chart.data = chart.data[columns]
+    for child in subcharts(chart):
+        project_columns(child)
+    return chart
+
+_index_column = re.compile(r"^(index|level_\d+|Unnamed: \d+)$")
+
+def _collect_strings(spec, strings):
+    if isinstance(spec, dict):
+        for value in spec.values():
+            _collect_strings(value, strings)
+    elif isinstance(spec, list):
+        for value in spec:
+            _collect_strings(value, strings)
+    elif isinstance(spec, six.string_types):
+        strings.add(spec)
+
+def _mentioned(chart):
+    """Strings used anywhere in the encodings, facets and transforms of chart and its sub-charts."""
+    strings = set()
+    for attr in ["encoding", "facet", "transform"]:
+        spec = getattr(chart, attr, alt.Undefined)
+        if isinstance(spec, alt.SchemaBase):
+            spec = spec.to_dict(validate=False)
+        elif isinstance(spec, list):
+            spec = [s.to_dict(validate=False) if isinstance(s, alt.SchemaBase) else s for s in spec]
+        if spec is not alt.Undefined:
+            _collect_strings(spec, strings)
+    for child in subcharts(chart):
+        strings |= _mentioned(child)
+    return strings
+
+def round_significant(values, digits):
+    """Round an array of floats to digits significant digits."""
+    values = np.asarray(values, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        magnitude = np.floor(np.log10(np.abs(values)))
+        scale = 10.0**(digits - 1 - np.where(np.isfinite(magnitude), magnitude, 0))
+        return np.round(values*scale) / scale
+
+def _dictionary_encode(data):
+    """Replace string columns by integer codes where it makes the data smaller, returning the lookup transforms decoding them."""
+    lookups = []
+    for column in list(data.columns):
+        if data[column].dtype.kind != "O" and str(data[column].dtype) != "category":
+            continue
+        codes, uniques = pd.factorize(data[column])
+        if 2*len(uniques) > len(data):
+            continue
+        # Serialized sizes of the column as labels and as codes with their lookup table
+        labels = np.array([len(json.dumps(u if isinstance(u, six.string_types) else str(u))) for u in uniques])
+        digits = np.array([len(str(i)) for i in range(len(uniques))])
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        plain = counts.dot(labels)
+        encoded = counts.dot(digits) + (labels + digits).sum() + 16*len(uniques) + 2*len(str(column)) + 80
+        if encoded >= plain:
+            continue
+        # Codes keep the field name, and the lookup writes the labels back over them
+        table = pd.DataFrame({"k": np.arange(len(uniques)), "v": uniques})
+        data = data.copy(deep=False)
+        data[column] = codes
+        lookups.append({
+            "lookup": column,
+            "from": {"data": {"values": alt.utils.data.to_values(table)["values"]}, "key": "k", "fields": ["v"]},
+            "as": [column],
+        })
+    return data, lookups
+
+def encode_data(chart):
+    """Apply the encoding options to the DataFrames embedded in chart and its sub-charts."""
+    if isinstance(getattr(chart, "data", None), pd.DataFrame):
+        data = chart.data
+        if options["drop_index"]:
+            mentioned = _mentioned(chart)
+            dropped = [c for c in data.columns if _index_column.match(str(c)) and c not in mentioned]
+            data = data.drop(columns=dropped)
+        if options["significant_digits"] is not None:
+            data = data.copy(deep=False)
+            for column in data.columns:
+                if data[column].dtype.kind == "f":
+                    data[column] = round_significant(data[column].values, options["significant_digits"])
+        if options["dictionary_encode"]:
+            data, lookups = _dictionary_encode(data)
+            if lookups:
+                # Decode before any other transform reads the fields
+                transform = getattr(chart, "transform", alt.Undefined)
+                chart.transform = lookups + ([] if transform is alt.Undefined else list(transform))
+        chart.data = data
+    for child in subcharts(chart):
+        encode_data(child)
+    return chart
+
+@timed("prepare_data")
+def prepare_data(chart):
+    """Reduce the data embedded in a chart built by this package before it is serialized."""
+    chart = project_columns(chart)
+    if options["dictionary_encode"] or options["significant_digits"] is not None or options["drop_index"]:
+        encode_data(chart)
+    if options["transport"] is not None:
+        options["transport"].hoist(chart)
+    return chart
@@ -0,0 +1,173 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import functools
+import json
+import threading
+from timeit import default_timer
+
+import numpy as np
+import pandas as pd
+
+# Callables receiving a record for each chart built; profiling is off while empty
+_exporters = []
+_state = threading.local()
+
+def add_exporter(exporter):
+    """Send a record of every chart built from now on to exporter.
+
+    Records are dicts with the entry point name (function), its duration in
+    seconds, the number of input rows, the size in bytes of the serialized
+    spec (spec_bytes) and the exclusive time spent in each phase (phases).
+    construct is the time spent building the chart outside of other phases.
+    """
+    _exporters.append(exporter)
+
+def remove_exporter(exporter):
+    _exporters.remove(exporter)
+
+def jsonl_exporter(f):
+    """Exporter writing records to the file object f, one JSON object per line."""
+    def export(record):
+        f.write(json.dumps(record) + "\n")
+    return export
+
+class Profile(object):
+    """Records collected by profile()."""
+
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def summary(self):
+        """Total time and time per phase of each entry point, as a text table."""
+        totals = OrderedDict()
+        for record in self.records:
+            name = record["function"] or "-"
+            total = totals.setdefault(name, dict(calls=0, seconds=0, phases=OrderedDict()))
+            total["calls"] += 1
+            total["seconds"] += record["seconds"]
+            for phase, seconds in record["phases"].items():
+                total["phases"][phase] = total["phases"].get(phase, 0) + seconds
+        lines = []
+        for name, total in totals.items():
+            lines.append("%-20s %5d calls %10.4fs" % (name, total["calls"], total["seconds"]))
+            for phase, seconds in total["phases"].items():
+                lines.append("  %-18s %22.4fs" % (phase, seconds))
+        return "\n".join(lines)
+
+@contextmanager
+def profile(exporter=None):
+    """Record the charts built in this block, also passing the records to exporter if given."""
+    p = Profile()
+    exporters = [p] if exporter is None else [p, exporter]
+    for e in exporters:
+        add_exporter(e)
+    try:
+        yield p
+    finally:
+        for e in exporters:
+            remove_exporter(e)
+
+def _export(record):
+    for exporter in list(_exporters):
+        exporter(record)
+
+def _stack(name):
+    if not hasattr(_state, name):
+        setattr(_state, name, [])
+    return getattr(_state, name)
+
+class _Disabled(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_disabled = _Disabled()
+
+class _Phase(object):
+    def __init__(self, name):
+        self.name = name
+        self.children = 0
+
+    def __enter__(self):
+        _stack("phases").append(self)
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = default_timer() - self.start
+        phases = _stack("phases")
+        phases.pop()
+        # Phases are recorded by exclusive time, so that they add up
+        if phases:
+            phases[-1].children += elapsed
+        exclusive = elapsed - self.children
+        entries = _stack("entries")
+        if entries:
+            entries[-1]["phases"][self.name] = entries[-1]["phases"].get(self.name, 0) + exclusive
+        else:
+            _export(dict(function=None, seconds=elapsed, rows=None, spec_bytes=None, phases={self.name: exclusive}))
+        return False
+
+def phase(name):
+    """Context manager timing a phase of the chart being built, doing nothing unless profiling."""
+    if not _exporters:
+        return _disabled
+    return _Phase(name)
+
+def timed(name):
+    """Decorator timing each call of a function as phase name."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _exporters:
+                return func(*args, **kwargs)
+            with _Phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _rows(args, kwargs):
+    # FacetGrid methods find their data on the grid
+    for value in [kwargs.get("data")] + list(args) + [getattr(a, "data", None) for a in args[:1]]:
+        if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+            return len(value)
+    return None
+
+def entry_point(func):
+    """Decorator recording calls of a public plot function, including its serialization.
+
+    Entry points called by other entry points are part of the outer record.
+    """
+    name = getattr(func, "__qualname__", func.__name__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _exporters and not _stack("entries"):
+            return _record(name, func, args, kwargs)
+        return func(*args, **kwargs)
+    return wrapper
+
+def _record(name, func, args, kwargs):
+    entries = _stack("entries")
+    record = dict(function=name, seconds=0, rows=_rows(args, kwargs), spec_bytes=None, phases=OrderedDict())
+    entries.append(record)
+    try:
+        start = default_timer()
+        result = func(*args, **kwargs)
+        built = default_timer() - start
+        record["phases"]["construct"] = built - sum(record["phases"].values())
+
+        chart = result if hasattr(result, "to_dict") else getattr(result, "chart", None)
+        if chart is not None:
+            with _Phase("serialize"):
+                record["spec_bytes"] = len(json.dumps(chart.to_dict(validate=False)))
+        record["seconds"] = default_timer() - start
+    finally:
+        entries.pop()
+    _export(record)
+    return result
@@ -1,24 +1,70 @@
 import altair as alt
 import numpy as np
 import pandas as pd
+import six
 import warnings
 
-from .util import build_dataframe, dtype_to_vega_type, size_chart, vega_color, vega_palette
+from .chunked import chunked_source, is_chunked, iter_chunks, peek, value_range
+from .datasets import prepare_data
+from .profiling import entry_point, timed
+from .sampling import bin2d, downsample, group_codes, lttb, minmax_envelope
+from .util import build_dataframe, dtype_to_vega_type, pixel_width, size_chart, vega_color, vega_palette
 
 
-def fill_between(x, y1, y2, color=None, style=None, data=None, palette=None, saturation=1, size=None, aspect=1):
+def _decimation_target(decimate, size, aspect):
+    if decimate is True or decimate == "auto":
+        return int(pixel_width(size, aspect))
+    return int(decimate)
+
+def _sorted_groups(data, x, color):
+    """Row positions split by color group, each sorted by x, and x as floats."""
+    vega_type = dtype_to_vega_type(data[x].dtype)
+    if vega_type == "temporal":
+        xv = data[x].values.astype(np.int64).astype(float)
+    elif vega_type == "quantitative":
+        xv = data[x].values.astype(float)
+    else:
+        raise ValueError("decimate requires a quantitative or temporal x")
+
+    if color in list(data.columns):
+        codes = group_codes(data, [color])
+    else:
+        codes = np.zeros(len(data), dtype=np.int64)
+    order = np.lexsort((xv, codes))
+    bounds = np.flatnonzero(np.diff(codes[order])) + 1
+    return np.split(order, bounds), xv
+
+def _decimate_line(data, x, y, color, n):
+    parts, xv = _sorted_groups(data, x, color)
+    yv = data[y].values
+    keep = [part[lttb(xv[part], yv[part], n)] for part in parts]
+    return data.iloc[np.concatenate(keep)]
+
+def _decimate_band(data, x, y1, y2, color, n):
+    parts, xv = _sorted_groups(data, x, color)
+    frames = []
+    for part in parts:
+        if len(part) <= n:
+            frames.append(data.iloc[part])
+            continue
+        starts, ends, lo, hi = minmax_envelope(data[y1].values[part], data[y2].values[part], n // 2)
+        # Each bucket spans from its first to its last sample
+        rows = np.ravel(np.column_stack([part[starts], part[ends]]))
+        frame = data.iloc[rows].copy()
+        frame[y1] = np.repeat(lo, 2)
+        frame[y2] = np.repeat(hi, 2)
+        frames.append(frame)
+    return pd.concat(frames)
+
+
+@entry_point
+def fill_between(x, y1, y2, color=None, style=None, data=None, palette=None, saturation=1, size=None, aspect=1, decimate=None):
     if data is None:
-        xname = x.name if isinstance(x, pd.Series) else "x"
-        data = pd.DataFrame({xname: x})
-        x = xname
-        if y1 is not None:
-            y1name = y1.name if isinstance(y1, pd.Series) else "y1"
-            data[y1name] = y1
-            y1 = y1name
-        if y2 is not None:
-            y2name = y2.name if isinstance(y2, pd.Series) else "y2"
-            data[y2name] = y2
-            y2 = y2name
+        data, fields = build_dataframe({"x": x, "y1": y1, "y2": y2})
+        x, y1, y2 = fields["x"], fields["y1"], fields["y2"]
+
+    if decimate:
+        data = _decimate_band(data, x, y1, y2, color, _decimation_target(decimate, size, aspect))
 
     encodings = {
         "x": alt.X(field=x, type=dtype_to_vega_type(data[x].dtype)),
@@ -34,33 +80,146 @@ def fill_between(x, y1, y2, color=None, style=None, data=None, palette=None, sat
     chart = alt.Chart(data).mark_area().encode(**encodings)
     size_chart(chart, size, aspect)
     pal = vega_palette(palette, None, saturation)
-    return chart.configure_range(category=pal)
+    return prepare_data(chart.configure_range(category=pal))
 
-def hist(x, color=None, data=None, palette=None, saturation=1, size=None, aspect=1):
+def _bin_edges(values, bins, bin_range):
+    if not np.isscalar(bins):
+        return np.asarray(bins, dtype=float)
+    if bin_range is None:
+        if values is None:
+            raise ValueError("range or explicit bin edges are required for chunked input")
+        bin_range = (np.nanmin(values), np.nanmax(values)) if len(values) else (0, 1)
+    lo, hi = bin_range
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+    return np.linspace(lo, hi, bins + 1)
+
+@timed("bin")
+def _bin_counts(values, edges, codes=None, ngroups=1):
+    nbins = len(edges) - 1
+    idx = np.searchsorted(edges, values, side="right") - 1
+    # The last bin is closed on the right, as in numpy.histogram
+    idx[values == edges[-1]] = nbins - 1
+    valid = (idx >= 0) & (idx < nbins)
+    if codes is not None:
+        valid &= codes >= 0
+        idx = codes*nbins + idx
+    counts = np.bincount(idx[valid], minlength=ngroups*nbins)
+    return counts.reshape(ngroups, nbins)
+
+@entry_point
+def hist(x, color=None, data=None, palette=None, saturation=1, size=None, aspect=1, bins=10, range=None, density=False):
+    groups = None
+    data = chunked_source(data)
     if data is None:
-        data = pd.DataFrame({"x": x})
-        x = "x"
+        x = chunked_source(x)
+    if is_chunked(data):
+        xname = x
+        if range is None and np.isscalar(bins):
+            range = value_range(data, x)
+        edges = _bin_edges(None, bins, range)
+        sample, data = peek(data)
+        by_color = bool(color) and color in list(sample.columns)
+        # Bin counts of each color group, merged over the chunks
+        totals = {}
+        order = []
+        for chunk in iter_chunks(data, [x, color] if by_color else [x]):
+            values = chunk[x].values.astype(float)
+            if by_color:
+                codes, uniques = pd.factorize(chunk[color])
+                counts = _bin_counts(values, edges, codes, len(uniques))
+            else:
+                uniques, counts = [None], _bin_counts(values, edges)
+            for group, group_counts in zip(uniques, counts):
+                if group not in totals:
+                    order.append(group)
+                    totals[group] = 0
+                totals[group] = totals[group] + group_counts
+        counts = np.array([totals[g] for g in order]).reshape(len(order), len(edges) - 1)
+        if by_color:
+            groups = order
+    elif data is None and is_chunked(x):
+        xname = "x"
+        edges = _bin_edges(None, bins, range)
+        counts = np.zeros((1, len(edges) - 1), dtype=np.int64)
+        for chunk in x:
+            counts += _bin_counts(np.asarray(chunk, dtype=float), edges)
+    else:
+        if data is None:
+            xname = x.name if isinstance(x, pd.Series) else "x"
+            values = np.asarray(x, dtype=float)
+        else:
+            xname = x
+            values = data[x].values.astype(float)
+        edges = _bin_edges(values[~np.isnan(values)], bins, range)
+        if color and data is not None and color in list(data.columns):
+            codes, groups = pd.factorize(data[color])
+            counts = _bin_counts(values, edges, codes, len(groups))
+        else:
+            counts = _bin_counts(values, edges)
+
+    ngroups, nbins = counts.shape
+    value = "count"
+    if density:
+        value = "density"
+        totals = counts.sum(axis=1, keepdims=True)
+        counts = counts / (np.maximum(totals, 1) * np.diff(edges))
+
+    table = pd.DataFrame({
+        "bin_start": np.tile(edges[:-1], ngroups),
+        "bin_end": np.tile(edges[1:], ngroups),
+        value: counts.ravel(),
+    })
+    if groups is not None:
+        table[color] = np.repeat(np.asarray(groups), nbins)
 
     encodings = {
-        "x": alt.X(bin=True, field=x, type="quantitative"),
-        "y": alt.Y(aggregate="count", type="quantitative"),
+        "x": alt.X(field="bin_start", type="quantitative", axis={"title": xname}),
+        "x2": alt.X(field="bin_end", type="quantitative"),
+        "y": alt.Y(field=value, type="quantitative"),
     }
     if color:
-        if color in list(data.columns):
-            encodings["color"] = alt.Color(field=color)
+        if groups is not None:
+            encodings["color"] = alt.Color(field=color, type="nominal")
         else:
             encodings["color"] = alt.Color(value=vega_color(color))
 
-    chart = alt.Chart(data).mark_bar().encode(**encodings)
+    chart = alt.Chart(table).mark_bar().encode(**encodings)
     size_chart(chart, size, aspect)
     pal = vega_palette(palette, None, saturation)
-    return chart.configure_range(category=pal)
+    return prepare_data(chart.configure_range(category=pal))
 
-def scatter(x, y, s=None, color=None, style=None, size_by=None, sizes=None, x_type="quantitative", color_type="nominal", size_type="quantitative", data=None, palette=None, saturation=1, size=None, aspect=1):
+def _density_chart(x, y, data, bins, palette, saturation, size, aspect):
+    if data[x].dtype.kind not in "biuf":
+        raise ValueError("density sampling requires a numeric x")
+    cells = bin2d(data[x], data[y], bins)
+    encodings = {
+        "x": alt.X(field="x_start", type="quantitative", axis={"title": x}),
+        "x2": alt.X(field="x_end", type="quantitative"),
+        "y": alt.Y(field="y_start", type="quantitative", axis={"title": y}),
+        "y2": alt.Y(field="y_end", type="quantitative"),
+        "color": alt.Color(field="count", type="quantitative"),
+    }
+    chart = alt.Chart(cells).mark_rect().encode(**encodings)
+    size_chart(chart, size, aspect)
+    pal = vega_palette(palette, None, saturation, vega_type="quantitative")
+    return prepare_data(chart.configure_range(ramp=pal))
+
+@entry_point
+def scatter(x, y, s=None, color=None, style=None, size_by=None, sizes=None, x_type="quantitative", color_type="nominal", size_type="quantitative", data=None, palette=None, saturation=1, size=None, aspect=1, max_points=None, sample="auto", random_state=None):
     if data is None:
         data, fields = build_dataframe({"x": x, "y": y})
         x, y = fields["x"], fields["y"]
 
+    if max_points is not None and len(data) > max_points:
+        if sample == "density":
+            bins = max(1, int(np.sqrt(max_points)))
+            return _density_chart(x, y, data, bins, palette, saturation, size, aspect)
+        strata = [f for f in [color, style] if isinstance(f, six.string_types) and f in list(data.columns)]
+        if sample == "auto":
+            sample = "stratified" if strata else "uniform"
+        data = downsample(data, max_points, sample, by=strata, random_state=random_state)
+
     encodings = {
         "x": alt.X(field=x, type=x_type, axis={"title": x}),
         "y": alt.Y(field=y, type="quantitative", axis={"title": y}),
@@ -93,13 +252,17 @@ def scatter(x, y, s=None, color=None, style=None, size_by=None, sizes=None, x_ty
         chart = chart.configure_range(category=pal)
     else:
         chart = chart.configure_range(ramp=pal)
-    return chart
+    return prepare_data(chart)
 
-def plot(x, y, s=None, color=None, data=None, palette=None, saturation=1, size=None, aspect=1):
+@entry_point
+def plot(x, y, s=None, color=None, data=None, palette=None, saturation=1, size=None, aspect=1, decimate=None):
     if data is None:
         data, fields = build_dataframe({"x": x, "y": y})
         x, y = fields["x"], fields["y"]
 
+    if decimate:
+        data = _decimate_line(data, x, y, color, _decimation_target(decimate, size, aspect))
+
     encodings = {
         "x": alt.X(field=x, type=dtype_to_vega_type(data[x].dtype)),
         "y": alt.Y(field=y, type="quantitative"),
@@ -113,4 +276,4 @@ def plot(x, y, s=None, color=None, data=None, palette=None, saturation=1, size=N
     chart = alt.Chart(data).mark_line().encode(**encodings)
     size_chart(chart, size, aspect)
     pal = vega_palette(palette, None, saturation)
-    return chart.configure_range(category=pal)
+    return prepare_data(chart.configure_range(category=pal))
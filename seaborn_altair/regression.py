@@ -1,19 +1,103 @@
 import altair as alt
+import numpy as np
 import pandas as pd
-import seaborn as sns
 import six
-from .util import build_dataframe, size_chart, vega_palette
+from .datasets import DatasetRegistry, holds_data, prepare_data
+from .profiling import entry_point, timed
+from .util import build_dataframe, parallel_map, partition, size_chart, vega_color, vega_palette
 from .pyplot import fill_between, plot, scatter as pscatter
 
 __all__ = ["regplot", "lmplot"]
 
+def fit_regression(
+    x, y, x_range, order=1, logx=False, ci=95, n_boot=1000, truncate=False,
+    seed=None, max_bytes=64*2**20
+):
+    """Fit a polynomial or log(x) linear model with bootstrapped confidence bands.
+
+    Returns (grid, yhat, err_bands) like seaborn's _RegressionPlotter.fit_regression.
+    All bootstrap fits are solved at once as least squares problems weighted by
+    how often each observation was resampled, in chunks of at most max_bytes.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[valid], y[valid]
+
+    x_min, x_max = (x.min(), x.max()) if truncate else x_range
+    grid = np.linspace(x_min, x_max, 100)
+
+    # Centering and scaling x does not change the fitted curve but keeps the
+    # normal equations well conditioned, also when x has a large offset
+    u, grid_u = (np.log(x), np.log(grid)) if logx else (x, grid)
+    center, scale = u.mean(), u.std() or 1.
+    degree = 1 if logx else order
+    X = np.vander((u - center) / scale, degree + 1)
+    G = np.vander((grid_u - center) / scale, degree + 1)
+
+    n, k = X.shape
+    XX = (X[:, :, None] * X[:, None, :]).reshape(n, k*k)
+    Xy = X * y[:, None]
+
+    def solve(weights):
+        xtx = weights.dot(XX).reshape(-1, k, k)
+        xty = weights.dot(Xy)[:, :, None]
+        beta = np.matmul(np.linalg.pinv(xtx), xty)[:, :, 0]
+        return beta.dot(G.T)
+
+    yhat = solve(np.ones((1, n)))[0]
+    if ci is None:
+        return grid, yhat, None
+
+    rng = np.random.RandomState(seed)
+    chunk = max(1, int(max_bytes // (16*n)))
+    boots = []
+    for start in range(0, n_boot, chunk):
+        size = min(chunk, n_boot - start)
+        index = rng.randint(0, n, size=(size, n))
+        flat = index + (np.arange(size)*n)[:, None]
+        weights = np.bincount(flat.ravel(), minlength=size*n).reshape(size, n)
+        boots.append(solve(weights.astype(float)))
+    yhat_boots = np.concatenate(boots)
+
+    err_bands = np.nanpercentile(yhat_boots, [50 - ci / 2., 50 + ci / 2.], axis=0)
+    return grid, yhat, err_bands
+
+def _fit_regression(task):
+    x, y, x_range, fit_kws = task
+    if fit_kws["units"] is None and not (fit_kws["logistic"] or fit_kws["lowess"] or fit_kws["robust"]):
+        return fit_regression(
+            x, y, x_range, order=fit_kws["order"], logx=fit_kws["logx"], ci=fit_kws["ci"],
+            n_boot=fit_kws["n_boot"], truncate=fit_kws["truncate"], seed=fit_kws.get("seed")
+        )
+    from seaborn.regression import _RegressionPlotter
+    p = _RegressionPlotter(x, y, **fit_kws)
+    return p.fit_regression(x_range=x_range)
+
+def _task_seeds(seed, n):
+    if seed is None:
+        return [None]*n
+    return list(np.random.RandomState(seed).randint(np.iinfo(np.int32).max, size=n))
+
+@timed("fit")
+def _fit_regressions(parts, x, y, x_range, fit_kws, seed=None, n_jobs=None, executor=None):
+    """Fit one regression per data part, in order, with a seed of its own for each fit."""
+    tasks = []
+    for part, part_seed in zip(parts, _task_seeds(seed, len(parts))):
+        kws = fit_kws if part_seed is None else dict(fit_kws, seed=part_seed)
+        tasks.append((part[x], part[y], x_range, kws))
+    return parallel_map(_fit_regression, tasks, n_jobs=n_jobs, executor=executor)
+
+@entry_point
+@holds_data
 def regplot(
     x, y, data=None, x_estimator=None, x_bins=None, x_ci="ci",
     x_range=None, y_range=None, truncate=False,
     scatter=True, fit_reg=True, ci=95, n_boot=1000, units=None,
     order=1, logistic=False, lowess=False, robust=False, logx=False,
     color=None, scatter_kws={}, line_kws={}, ax=None,
-    palette=None, height=None, aspect=1, color_scale=None
+    palette=None, height=None, aspect=1, color_scale=None, datasets=None,
+    seed=None, n_jobs=None, executor=None, fits=None, parts=None
 ):
 
     if data is None:
@@ -25,15 +109,14 @@ def regplot(
         x_pad = 0.05*(x_raw_range[1] - x_raw_range[0])
         x_range = (x_raw_range[0] - x_pad, x_raw_range[1] + x_pad)
 
-    def plot_regression(data, color):
-        p = sns.regression._RegressionPlotter(
-            data[x], data[y], x_estimator=x_estimator, x_bins=x_bins, x_ci=x_ci,
-            n_boot=n_boot, units=units, ci=ci, truncate=truncate,
-            order=order, logistic=logistic, lowess=lowess, robust=robust, logx=logx
-        )
+    fit_kws = dict(
+        n_boot=n_boot, units=units, ci=ci, truncate=truncate,
+        order=order, logistic=logistic, lowess=lowess, robust=robust, logx=logx
+    )
 
+    def plot_regression(fit, color):
         layers = []
-        grid, yhat, err_bands = p.fit_regression(x_range=x_range)
+        grid, yhat, err_bands = fit
         layers.append(plot(grid, yhat, color=color, **line_kws))
         if err_bands is not None:
             area = fill_between(grid, *err_bands, color=color)
@@ -42,30 +125,46 @@ def regplot(
         return layers
 
     def plot_scatter(data, color):
-        p = sns.regression._RegressionPlotter(
-            data[x], data[y], x_estimator=x_estimator, x_bins=x_bins, x_ci=x_ci,
-            n_boot=n_boot, units=units, ci=ci, truncate=truncate,
-            order=order, logistic=logistic, lowess=lowess, robust=robust, logx=logx
-        )
-
         layers = []
-        if p.x_estimator is None:
+        if x_estimator is None and x_bins is None:
             layers.append(pscatter(x, y, data=data, color=color, **scatter_kws))
         else:
+            from seaborn.regression import _RegressionPlotter
+            p = _RegressionPlotter(
+                data[x], data[y], x_estimator=x_estimator, x_bins=x_bins, x_ci=x_ci,
+                n_boot=n_boot, units=units, ci=ci, truncate=truncate,
+                order=order, logistic=logistic, lowess=lowess, robust=robust, logx=logx
+            )
             xs, ys, cis = p.estimate_data
-            if [ci for ci in cis if ci is not None]:
-                for xval, cci in zip(xs, cis):
-                    ci_df = pd.DataFrame({x: [xval, xval], y: cci})
-                    layers.append(plot(x, y, data=ci_df))
+            valid = [i for i, cci in enumerate(cis) if cci is not None]
+            if valid:
+                # All confidence intervals go in one rule layer
+                bounds = np.array([cis[i] for i in valid], dtype=float)
+                lo, hi = "%s_ci0" % y, "%s_ci1" % y
+                ci_df = pd.DataFrame({x: np.asarray(xs)[valid], lo: bounds[:, 0], hi: bounds[:, 1]})
+                ci_encodings = {
+                    "x": alt.X(field=x, type="quantitative"),
+                    "y": alt.Y(field=lo, type="quantitative", axis={"title": y}),
+                    "y2": alt.Y(field=hi, type="quantitative"),
+                }
+                if color:
+                    ci_encodings["color"] = alt.Color(value=vega_color(color))
+                layers.append(alt.Chart(ci_df).mark_rule().encode(**ci_encodings))
             estimate_df = pd.DataFrame({x: xs, y: ys})
             layers.append(pscatter(x, y, data=estimate_df, color=color, **scatter_kws))
         return layers
 
+    if parts is None:
+        if color and color in list(data.columns):
+            groups = partition(data, [color])
+            parts = [(v, groups[(v,)]) for v in data[color].unique() if (v,) in groups]
+        else:
+            parts = [(None, data)]
+
     if color and color in list(data.columns):
         if color_scale is None:
             val = data[color].unique()
-            pal = sns.color_palette(palette)
-            color_scale = alt.Scale(domain=list(val), range=vega_palette(pal))
+            color_scale = alt.Scale(domain=list(val), range=vega_palette(palette))
         else:
             val = color_scale.domain
 
@@ -73,23 +172,23 @@ def regplot(
         for i in range(len(color_scale.domain)):
             color_map[color_scale.domain[i]] = color_scale.range[i % len(color_scale.range)]
 
-        layers = []
-        if scatter:
-            for v in data[color].unique():
-                part = data.loc[data[color] == v]
-                layers += plot_scatter(part, color_map[v])
-
-        if fit_reg:
-            for v in data[color].unique():
-                part = data.loc[data[color] == v]
-                layers += plot_regression(part, color_map[v])
+        parts = [(part, color_map[v]) for v, part in parts]
     else:
-        layers = []
-        if scatter:
-            layers += plot_scatter(data, color)
+        parts = [(part, color) for _, part in parts]
+
+    layers = []
+    if scatter:
+        for part, part_color in parts:
+            layers += plot_scatter(part, part_color)
 
-        if fit_reg:
-            layers += plot_regression(data, color)
+    if fit_reg:
+        if fits is None:
+            fits = _fit_regressions(
+                [part for part, _ in parts], x, y, x_range, fit_kws,
+                seed=seed, n_jobs=n_jobs, executor=executor
+            )
+        for (part, part_color), fit in zip(parts, fits):
+            layers += plot_regression(fit, part_color)
 
     for layer in layers:
         if isinstance(layer.mark, six.string_types):
@@ -101,10 +200,17 @@ def regplot(
             layer.encoding.y.scale=alt.Scale(domain=y_range, nice=False)
         layer.config = alt.Undefined
 
-    chart = alt.LayerChart(layer=layers)
+    chart = prepare_data(alt.LayerChart(layer=layers))
+
+    # lmplot shares the data of its facets as named datasets of the top-level
+    # chart; a standalone chart keeps it inline, so that it can be composed
+    if datasets is not None:
+        datasets.hoist(chart)
     return chart
 
 
+@entry_point
+@holds_data
 def lmplot(
     x, y, data, hue=None, col=None, row=None, palette=None,
     x_estimator=None, x_bins=None, x_ci="ci",
@@ -112,7 +218,7 @@ def lmplot(
     hue_order=None, col_order=None, row_order=None,
     scatter=True, fit_reg=True, ci=95, n_boot=1000, truncate=False,
     units=None, order=1, logistic=False, lowess=False, robust=False,
-    logx=False, scatter_kws={}, line_kws={}
+    logx=False, scatter_kws={}, line_kws={}, seed=None, n_jobs=None, executor=None
 ):
 
     x_raw_range = (data[x].min(), data[x].max())
@@ -134,31 +240,54 @@ def lmplot(
     rows = unique_with_order(data[row], row_order) if row else [1]
     hues = unique_with_order(data[hue], hue_order) if hue else [1]
 
-    pal = sns.color_palette(palette)
-    color_scale = alt.Scale(domain=list(hues), range=vega_palette(pal))
+    color_scale = alt.Scale(domain=list(hues), range=vega_palette(palette))
 
-    charts = []
+    # Split the data by row, column and hue once, shared by the scatter and fit stages
+    keys = [k for k in [row, col, hue] if k]
+    groups = partition(data, keys) if keys else {(): data}
+
+    cells = []
     for r in rows:
-        row_part = data.loc[data[row] == r] if row else data
-        chart_row = []
         for c in cols:
-            part = row_part.loc[row_part[col] == c] if col else row_part
-            chart = regplot(
-                data=part, x=x, y=y, color=hue, palette=palette, x_range=x_range, y_range=y_range,
-                x_estimator=x_estimator, x_bins=x_bins, x_ci=x_ci,
-                scatter=scatter, fit_reg=fit_reg, ci=ci, n_boot=n_boot, units=units, truncate=truncate,
-                order=order, logistic=logistic, lowess=lowess, robust=robust, logx=logx,
-                scatter_kws=scatter_kws, line_kws=line_kws, color_scale=color_scale,
-            )
-            size_chart(chart, height, aspect)
-            chart.title = ("%s = %s" % (row, r) if row else "") + (" | " if row and col else "") + ("%s = %s" % (col, c) if col else "")
-            chart_row.append(chart)
-            if col_wrap is not None and len(chart_row) >= col_wrap:
-                charts.append(chart_row)
-                chart_row = []
-
-        if len(chart_row) > 0:
+            cell_key = tuple(v for k, v in [(row, r), (col, c)] if k)
+            if hue:
+                cell_parts = [(h, groups[cell_key + (h,)]) for h in hues if cell_key + (h,) in groups]
+            else:
+                cell_parts = [(None, groups[cell_key])] if cell_key in groups else []
+            cells.append((r, c, cell_parts))
+
+    # Fit every (row, col, hue) part at once so they can share a process pool
+    cell_fits = [None]*len(cells)
+    if fit_reg:
+        fit_kws = dict(
+            n_boot=n_boot, units=units, ci=ci, truncate=truncate,
+            order=order, logistic=logistic, lowess=lowess, robust=robust, logx=logx
+        )
+        fits = _fit_regressions(
+            [p for cell in cells for _, p in cell[2]], x, y, x_range, fit_kws,
+            seed=seed, n_jobs=n_jobs, executor=executor
+        )
+        for i, cell in enumerate(cells):
+            cell_fits[i], fits = fits[:len(cell[2])], fits[len(cell[2]):]
+
+    datasets = DatasetRegistry()
+    charts = []
+    chart_row = []
+    for i, ((r, c, cell_parts), fits) in enumerate(zip(cells, cell_fits)):
+        chart = regplot(
+            data=data, x=x, y=y, color=hue, palette=palette, x_range=x_range, y_range=y_range,
+            x_estimator=x_estimator, x_bins=x_bins, x_ci=x_ci,
+            scatter=scatter, fit_reg=fit_reg, ci=ci, n_boot=n_boot, units=units, truncate=truncate,
+            order=order, logistic=logistic, lowess=lowess, robust=robust, logx=logx,
+            scatter_kws=scatter_kws, line_kws=line_kws, color_scale=color_scale,
+            datasets=datasets, fits=fits, parts=cell_parts,
+        )
+        size_chart(chart, height, aspect)
+        chart.title = ("%s = %s" % (row, r) if row else "") + (" | " if row and col else "") + ("%s = %s" % (col, c) if col else "")
+        chart_row.append(chart)
+        if (col_wrap is not None and len(chart_row) >= col_wrap) or (i + 1) % len(cols) == 0:
             charts.append(chart_row)
+            chart_row = []
 
     if len(charts) > 1 or len(charts[0]) > 1:
         chart_rows = []
@@ -168,4 +297,5 @@ def lmplot(
     else:
         facets = charts[0][0]
 
+    facets.datasets = datasets.datasets
     return facets
@@ -1,13 +1,15 @@
 import numpy as np
 import pandas as pd
+from .profiling import entry_point
 from .pyplot import scatter
 from .util import build_dataframe, dtype_to_vega_type
 
 __all__ = ["scatterplot"]
 
+@entry_point
 def scatterplot(
     x=None, y=None, hue=None, style=None, size=None, data=None,
-    palette=None, sizes=[10, 80]
+    palette=None, sizes=[10, 80], max_points=None, sample="auto", random_state=None
 ):
     if data is None:
         data, names = build_dataframe({"x": x, "y": y, "hue": hue, "style": style, "size": size})
@@ -24,7 +26,10 @@ def scatterplot(
         data = plot_data
 
     x_type = dtype_to_vega_type(data[x].dtype)
-    params = dict(x=x, x_type=x_type, y=y, color=hue, style=style, size_by=size, sizes=sizes, palette=palette, data=data)
+    params = dict(
+        x=x, x_type=x_type, y=y, color=hue, style=style, size_by=size, sizes=sizes, palette=palette, data=data,
+        max_points=max_points, sample=sample, random_state=random_state
+    )
     if hue is not None:
         params['color_type'] = dtype_to_vega_type(data[hue].dtype)
     if size is not None:
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+from .profiling import timed
+
+def group_codes(data, by):
+    """Integer code of the (by...) group of each row, with missing values as their own group."""
+    codes = np.zeros(len(data), dtype=np.int64)
+    for column in by:
+        col_codes, uniques = pd.factorize(data[column])
+        codes = codes*(len(uniques) + 1) + col_codes + 1
+    return pd.factorize(codes)[0]
+
+def uniform_sample(data, n, random_state=None):
+    rng = np.random.RandomState(random_state)
+    keep = rng.choice(len(data), n, replace=False)
+    return data.iloc[np.sort(keep)]
+
+def stratified_sample(data, by, n, random_state=None):
+    """Sample about n rows, keeping group proportions and at least one row of every group."""
+    rng = np.random.RandomState(random_state)
+    codes = group_codes(data, by)
+    sizes = np.bincount(codes)
+    quota = np.minimum(sizes, np.maximum(1, n*sizes // len(data)))
+
+    # Visit rows in random order, grouped by code, and keep the first quota of each group
+    order = rng.permutation(len(data))
+    order = order[np.argsort(codes[order], kind="mergesort")]
+    starts = np.cumsum(sizes) - sizes
+    rank = np.arange(len(data)) - np.repeat(starts, sizes)
+    keep = order[rank < quota[codes[order]]]
+    return data.iloc[np.sort(keep)]
+
+@timed("sample")
+def downsample(data, n, strategy="uniform", by=None, random_state=None):
+    if len(data) <= n:
+        return data
+    if strategy == "uniform" or (strategy == "stratified" and not by):
+        return uniform_sample(data, n, random_state)
+    if strategy == "stratified":
+        return stratified_sample(data, by, n, random_state)
+    raise ValueError("strategy must be uniform or stratified")
+
+@timed("bin")
+def bin2d(x, y, bins):
+    """Count points on a regular 2D grid, returning the non-empty cells."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.isfinite(x) & np.isfinite(y)
+    counts, xedges, yedges = np.histogram2d(x[valid], y[valid], bins=bins)
+    xi, yi = np.nonzero(counts)
+    return pd.DataFrame({
+        "x_start": xedges[xi], "x_end": xedges[xi + 1],
+        "y_start": yedges[yi], "y_end": yedges[yi + 1],
+        "count": counts[xi, yi],
+    })
+
+@timed("decimate")
+def lttb(x, y, n):
+    """Indices of the n points kept by Largest-Triangle-Three-Buckets decimation."""
+    length = len(x)
+    if n >= length or n < 3:
+        return np.arange(length)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # The first and last points are always kept, the rest is split in n - 2 buckets
+    edges = np.linspace(1, length - 1, n - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / counts, y[-1])
+
+    selected = np.empty(n, dtype=np.int64)
+    selected[0], selected[-1] = 0, length - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - avg_x[i + 1])*(y[lo:hi] - y[a]) - (x[a] - x[lo:hi])*(avg_y[i + 1] - y[a])
+        )
+        a = lo + np.argmax(np.where(np.isnan(area), -1, area))
+        selected[i + 1] = a
+    return selected
+
+@timed("decimate")
+def minmax_envelope(y1, y2, n):
+    """Split samples in n buckets, returning bucket bounds and the min/max over y1 and y2."""
+    length = len(y1)
+    starts = np.unique(np.linspace(0, length, n, endpoint=False).astype(np.int64))
+    ends = np.append(starts[1:], length) - 1
+    y1 = np.asarray(y1, dtype=float)
+    y2 = np.asarray(y2, dtype=float)
+    lo = np.fmin.reduceat(np.fmin(y1, y2), starts)
+    hi = np.fmax.reduceat(np.fmax(y1, y2), starts)
+    return starts, ends, lo, hi
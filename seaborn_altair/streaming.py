@@ -0,0 +1,93 @@
+from collections import deque
+
+import altair as alt
+import pandas as pd
+
+from .axisgrid import FacetGrid, _data_nodes
+from .datasets import default_data_options
+
+class StreamingChart(object):
+    """Chart whose data is updated with Vega changesets instead of re-serializing it.
+
+    The chart is built once by func, e.g. pyplot.plot or scatterplot, called
+    with data and kwargs, and reads its rows from the named dataset name. Its
+    spec never changes: append returns the changeset to apply in the browser,
+    and only the last max_rows rows are kept. With window set, rows whose
+    window_field (x by default) is more than window below the newest one
+    expire. Charts reducing their data, e.g. with decimate or max_points,
+    are rejected. Each row carries an id_field the removals refer to::
+
+        view.change(c.name, vega.changeset().insert(c.insert)
+            .remove(d => c.remove.includes(d.row_id)))
+    """
+
+    def __init__(self, func, data, name="stream", max_rows=10000, window=None, window_field=None, id_field="row_id", **kwargs):
+        reducing = [k for k in ["decimate", "max_points"] if kwargs.get(k)]
+        if reducing:
+            raise ValueError("Streaming does not reduce appended rows, %s cannot be used" % " and ".join(reducing))
+        # Rows are sent as they are, so the chart must not encode them
+        with default_data_options():
+            chart = func(data=data, **kwargs)
+        if isinstance(chart, FacetGrid):
+            chart = chart.chart
+        nodes = _data_nodes(chart)
+        if len(nodes) != 1:
+            raise ValueError("Streaming requires a chart with a single data source")
+        node = list(nodes.values())[0]
+        self.columns = list(node.data.columns)
+        if not set(self.columns) <= set(data.columns) or len(node.data) != len(data):
+            raise ValueError("Streaming requires a chart embedding its rows as they are")
+        node.data = alt.NamedData(name=name)
+
+        self.chart = chart
+        self.name = name
+        self.window = window
+        self.window_field = window_field if window_field is not None else kwargs.get("x")
+        self.id_field = id_field
+        self.buffer = deque(maxlen=max_rows)
+        self._next_id = 0
+        self.initial = self.append(data)
+
+    def to_dict(self, *args, **kwargs):
+        return self.chart.to_dict(*args, **kwargs)
+
+    def append(self, rows):
+        """Add rows, a DataFrame, dict or list of dicts, and return the resulting changeset."""
+        if not isinstance(rows, pd.DataFrame):
+            rows = pd.DataFrame(rows if isinstance(rows, list) else [rows])
+        # Rows pushed out by the same batch are never sent
+        if len(rows) > self.buffer.maxlen:
+            rows = rows.iloc[len(rows) - self.buffer.maxlen:]
+
+        records = alt.utils.data.to_values(rows[self.columns])["values"]
+        keys = rows[self.window_field].values if self.window is not None else [None]*len(rows)
+        first_id = self._next_id
+        inserted, removed = [], []
+        for record, key in zip(records, keys):
+            record[self.id_field] = self._next_id
+            self._next_id += 1
+            if len(self.buffer) == self.buffer.maxlen:
+                removed.append(self.buffer.popleft()[0][self.id_field])
+            self.buffer.append((record, key))
+            inserted.append(record)
+
+        if self.window is not None and len(self.buffer):
+            start = self.buffer[-1][1] - self.window
+            while self.buffer[0][1] < start:
+                removed.append(self.buffer.popleft()[0][self.id_field])
+
+        # Rows inserted and expired by the same batch are never sent
+        expired = set(removed)
+        inserted = [r for r in inserted if r[self.id_field] not in expired]
+        removed = [i for i in removed if i < first_id]
+        return dict(name=self.name, insert=inserted, remove=removed)
+
+    def clear(self):
+        """Remove every row, returning the changeset doing so."""
+        removed = [record[self.id_field] for record, _ in self.buffer]
+        self.buffer.clear()
+        return dict(name=self.name, insert=[], remove=removed)
+
+    def values(self):
+        """Records currently held, oldest first."""
+        return [record for record, _ in self.buffer]
@@ -0,0 +1,157 @@
+from contextlib import contextmanager
+import json
+import os
+import time
+
+import altair as alt
+import pandas as pd
+
+from .datasets import fingerprint, subcharts
+from .util import write_atomic
+
+FORMATS = {"json": ".json", "csv": ".csv", "arrow": ".arrow"}
+
+class DataStore(object):
+    """Content-addressed files holding chart data, referenced from specs by URL.
+
+    Each distinct table is written once to directory, in JSON, CSV or Arrow IPC
+    format. Files are referenced as url_prefix/<name>, or by their path if
+    url_prefix is None. Least recently used files are evicted past max_files
+    or max_bytes, and files unused for max_age seconds are removed; limits
+    should leave room for all the tables of the charts still displayed.
+    Files a chart being built references are never evicted.
+
+    Arrow files need the vega-loader-arrow plugin in the browser, and specs
+    referencing them must be serialized with to_dict(validate=False).
+
+    Use it for every chart built in a block with::
+
+        with data_options(transport=DataStore("data")):
+            chart = barplot(x="day", y="total_bill", data=tips)
+    """
+
+    def __init__(self, directory, format="json", url_prefix=None, max_files=None, max_bytes=None, max_age=None):
+        if format not in FORMATS:
+            raise ValueError("format must be one of %s" % ", ".join(sorted(FORMATS)))
+        self.directory = directory
+        self.format = format
+        self.url_prefix = url_prefix
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        # Paths stored in each open holding() block, innermost last
+        self._held = []
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def url(self, name):
+        if self.url_prefix is None:
+            return "/".join([self.directory.rstrip("/"), name])
+        return "/".join([self.url_prefix.rstrip("/"), name])
+
+    def put(self, data):
+        """Store a DataFrame, unless an identical one is stored already, and return its UrlData."""
+        name = fingerprint(data) + FORMATS[self.format]
+        path = self.path(name)
+        if os.path.exists(path):
+            os.utime(path, None)
+        else:
+            write_atomic(path, lambda tmp: self._write(data, tmp))
+        if self._held:
+            self._held[-1].add(path)
+        else:
+            self.evict(keep=[path])
+        if self.format == "arrow":
+            # Not in the Vega-Lite schema, but understood by Vega with vega-loader-arrow
+            return {"url": self.url(name), "format": {"type": "arrow"}}
+        return alt.UrlData(url=self.url(name), format={"type": self.format})
+
+    def _write(self, data, path):
+        if self.format == "json":
+            with open(path, "w") as f:
+                json.dump(alt.utils.data.to_values(data)["values"], f, separators=(",", ":"))
+        elif self.format == "csv":
+            data.to_csv(path, index=False)
+        else:
+            try:
+                import pyarrow as pa
+            except ImportError:
+                raise ImportError("The arrow format requires pyarrow")
+            table = pa.Table.from_pandas(data, preserve_index=False)
+            with pa.OSFile(path, "wb") as sink:
+                writer = pa.ipc.new_file(sink, table.schema)
+                writer.write_table(table)
+                writer.close()
+
+    def read(self, name, memory_map=False):
+        """Load a stored table back as a DataFrame, memory-mapping Arrow files if asked to."""
+        path = self.path(os.path.basename(name))
+        if self.format == "json":
+            return pd.read_json(path, orient="records")
+        if self.format == "csv":
+            return pd.read_csv(path)
+        import pyarrow as pa
+        source = pa.memory_map(path) if memory_map else pa.OSFile(path, "rb")
+        with source:
+            return pa.ipc.open_file(source).read_all().to_pandas()
+
+    @contextmanager
+    def holding(self):
+        """Evict files only at the end of the block, keeping those stored in it."""
+        self._held.append(set())
+        try:
+            yield
+        finally:
+            held = self._held.pop()
+            if self._held:
+                self._held[-1] |= held
+            else:
+                self.evict(keep=held)
+
+    def hoist(self, chart):
+        """Replace DataFrames embedded anywhere in chart by URLs of stored files."""
+        with self.holding():
+            self._hoist(chart)
+        return chart
+
+    def _hoist(self, chart):
+        if isinstance(getattr(chart, "data", None), pd.DataFrame):
+            chart.data = self.put(chart.data)
+        for child in subcharts(chart):
+            self._hoist(child)
+
+    def files(self):
+        """Stored files as (path, size, last use) tuples, least recently used first."""
+        files = []
+        for name in os.listdir(self.directory):
+            if os.path.splitext(name)[1] in FORMATS.values():
+                st = os.stat(self.path(name))
+                files.append((self.path(name), st.st_size, st.st_mtime))
+        return sorted(files, key=lambda f: f[2])
+
+    def evict(self, keep=()):
+        """Remove files past the store limits, least recently used first, except the paths in keep."""
+        keep = set(keep)
+        files = self.files()
+        count = len(files)
+        total = sum(f[1] for f in files)
+        now = time.time()
+        for path, size, used in files:
+            if path in keep:
+                continue
+            if (
+                (self.max_files is not None and count > self.max_files) or
+                (self.max_bytes is not None and total > self.max_bytes) or
+                (self.max_age is not None and now - used > self.max_age)
+            ):
+                os.remove(path)
+                count -= 1
+                total -= size
+
+    def cleanup(self):
+        """Remove every stored file."""
+        for path, _, _ in self.files():
+            os.remove(path)
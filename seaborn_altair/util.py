@@ -1,48 +1,100 @@
+from collections import OrderedDict
 import altair as alt
-from matplotlib.colors import to_rgba
 import numpy as np
+import os
 import pandas as pd
-import seaborn as sns
-import matplotlib as mpl
 import six
+import weakref
+
+from .profiling import timed
+
+# seaborn and matplotlib are slow to import and only needed for colors and
+# chart sizes, so they are imported by the functions using them.
 
 def build_dataframe(fields):
+    """Frame of the given vectors, built at once without copying them.
+
+    Columns are named after their Series, or else after their field. Series are
+    aligned on the index of the first one, as when assigning them one by one.
+    """
     field_names = {}
-    data = pd.DataFrame()
+    columns = OrderedDict()
+    index = None
     for name, field in six.iteritems(fields):
-        if field is not None:
-            if isinstance(field, pd.Series):
-                fname = field.name
-            else:
-                fname = name
-            data[fname] = field
-            field_names[name] = fname
-        else:
+        if field is None:
             field_names[name] = None
-    return data, field_names
+            continue
+        fname = name
+        if isinstance(field, pd.Series):
+            if field.name is not None and field.name not in columns:
+                fname = field.name
+            if index is None:
+                index = field.index
+            elif not field.index.equals(index):
+                field = field.reindex(index)
+        elif isinstance(field, (list, tuple)):
+            field = np.asarray(field)
+        columns[fname] = field
+        field_names[name] = fname
+    return pd.DataFrame(columns, copy=False), field_names
+
+# Keyed by dtype name, as there is a dtype per set of categories
+_vega_types = {}
 
 def dtype_to_vega_type(t):
-    if t == np.dtype('datetime64[ns]'):
-        return 'temporal'
-    if t == np.float64 or t == np.int64:
-        return 'quantitative'
-    return 'nominal'
+    key = str(t)
+    vega_type = _vega_types.get(key)
+    if vega_type is None:
+        if t == np.dtype('datetime64[ns]'):
+            vega_type = 'temporal'
+        elif t == np.float64 or t == np.int64:
+            vega_type = 'quantitative'
+        else:
+            vega_type = 'nominal'
+        _vega_types[key] = vega_type
+    return vega_type
 
 def size_chart(chart, size, aspect):
-    dpi = mpl.rcParams['figure.dpi']
     if size:
+        import matplotlib as mpl
+        dpi = mpl.rcParams['figure.dpi']
         if isinstance(chart, alt.FacetChart):
             chart = chart.spec
         chart.height = size*dpi
         chart.width = aspect*size*dpi
 
+def pixel_width(size, aspect):
+    """Width in pixels of a chart sized with size_chart, or the default view width."""
+    if size:
+        import matplotlib as mpl
+        return aspect*size*mpl.rcParams['figure.dpi']
+    return 400
+
 def vega_color(color):
     if isinstance(color, six.string_types) and (color.startswith('rgb(') or color.startswith('rgba(')):
         return color
+    from matplotlib.colors import to_rgba
     c = to_rgba(color)
     return "rgba(%s,%s,%s,%s)" % (int(c[0]*255), int(c[1]*255), int(c[2]*255), c[3])
 
-def vega_palette(palette, color=None, saturation=1, vega_type="nominal"):
+# Most recently used palettes, see vega_palette
+_palettes = OrderedDict()
+PALETTE_CACHE_SIZE = 256
+
+def _palette_key(value):
+    import matplotlib as mpl
+    if isinstance(value, mpl.colors.Colormap):
+        colors = getattr(value, "colors", None)
+        return ("Colormap", value.name, value.N, _palette_key(colors))
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return tuple(_palette_key(v) for v in value)
+    return value
+
+def _vega_palette(palette, color, saturation, vega_type):
+    import matplotlib as mpl
+    import seaborn as sns
     if palette:
         if isinstance(palette, mpl.colors.Colormap):
             pal = palette.colors
@@ -61,38 +113,121 @@ def vega_palette(palette, color=None, saturation=1, vega_type="nominal"):
     pal = sns.color_palette(pal)
     return [vega_color(c) for c in pal]
 
-def vega_semantic_type(data):
+@timed("palette")
+def vega_palette(palette, color=None, saturation=1, vega_type="nominal"):
+    import matplotlib as mpl
+    key = (_palette_key(palette), _palette_key(color), saturation, vega_type)
+    if not palette and not color:
+        # The default palette follows the matplotlib color cycle
+        key += (tuple(mpl.rcParams["axes.prop_cycle"].by_key().get("color", [])),)
     try:
-        float_data = data.astype(np.float)
-        values = np.unique(float_data.dropna())
-        if np.array_equal(values, np.array([0., 1.])):
+        pal = _palettes.pop(key)
+    except KeyError:
+        pal = _vega_palette(palette, color, saturation, vega_type)
+    except TypeError:
+        # Unhashable palette specification
+        return _vega_palette(palette, color, saturation, vega_type)
+
+    _palettes[key] = pal
+    if len(_palettes) > PALETTE_CACHE_SIZE:
+        _palettes.popitem(last=False)
+    return list(pal)
+
+# Column inferences of live frames, keyed by id(frame)
+_inferences = {}
+
+def cached_inference(data, column, infer):
+    """Result of infer(data[column]), cached until data is garbage collected.
+
+    Entries are keyed on the column dtype and length too, so replacing a
+    column by one of another type or resizing the frame invalidates them.
+    """
+    key = id(data)
+    entry = _inferences.get(key)
+    if entry is None or entry[0]() is not data:
+        def forget(ref):
+            if _inferences.get(key, (None,))[0] is ref:
+                del _inferences[key]
+        try:
+            entry = (weakref.ref(data, forget), {})
+        except TypeError:
+            return infer(data[column])
+        _inferences[key] = entry
+
+    series = data[column]
+    result_key = (infer, column, series.dtype, len(series))
+    results = entry[1]
+    if result_key not in results:
+        results[result_key] = infer(series)
+    return results[result_key]
+
+def sample_values(s, n=1000):
+    """Up to n non-null values spread evenly over s."""
+    if len(s) > n:
+        s = s.iloc[np.linspace(0, len(s) - 1, n).astype(np.int64)]
+    return s.dropna()
+
+def _semantic_type(s):
+    if s.dtype.kind == "b":
+        return "nominal"
+    if s.dtype.kind in "iuf":
+        values = s.values
+    else:
+        try:
+            values = np.asarray(sample_values(s), dtype=float)
+        except (ValueError, TypeError):
             return "nominal"
-        return "quantitative"
-    except (ValueError, TypeError):
+    # Binary indicator columns are treated as categories
+    is_zero, is_one = values == 0, values == 1
+    if is_zero.any() and is_one.any() and (is_zero | is_one | np.isnan(values)).all():
         return "nominal"
+    return "quantitative"
 
-# From seaborn.categorical
-def infer_orient(x, y, orient=None):
-    """Determine how the plot should be oriented based on the data."""
-    orient = str(orient)
+@timed("infer_types")
+def vega_semantic_type(data, column=None):
+    """Vega type of a Series, or of data[column] cached for the lifetime of data."""
+    if column is not None:
+        return cached_inference(data, column, _semantic_type)
+    return _semantic_type(data)
 
-    def is_categorical(s):
+def _orient_kind(s):
+    try:
+        # Correct way, but does not exist in older Pandas
         try:
-            # Correct way, but does not exist in older Pandas
-            try:
-                return pd.api.types.is_categorical_dtype(s)
-            except AttributeError:
-                return pd.core.common.is_categorical_dtype(s) # pylint: disable=E1101
+            if pd.api.types.is_categorical_dtype(s):
+                return "categorical"
         except AttributeError:
-            # Also works, but feels hackier
-            return str(s.dtype) == "categorical"
+            if pd.core.common.is_categorical_dtype(s): # pylint: disable=E1101
+                return "categorical"
+    except AttributeError:
+        # Also works, but feels hackier
+        if str(s.dtype) == "categorical":
+            return "categorical"
 
-    def is_not_numeric(s):
-        try:
-            np.asarray(s, dtype=np.float)
-        except ValueError:
-            return True
-        return False
+    # Decide from the dtype, only object columns need looking at their values
+    if s.dtype.kind in "biufc":
+        return "numeric"
+    if s.dtype.kind != "O":
+        return "other"
+    try:
+        np.asarray(sample_values(s), dtype=float)
+    except (ValueError, TypeError):
+        return "other"
+    return "numeric"
+
+# From seaborn.categorical
+@timed("infer_orient")
+def infer_orient(x, y, orient=None, data=None):
+    """Determine how the plot should be oriented based on the data.
+
+    x and y are Series, or columns of data whose inferred types are cached.
+    """
+    orient = str(orient)
+
+    def kind(v):
+        if data is None:
+            return _orient_kind(v)
+        return cached_inference(data, v, _orient_kind)
 
     no_numeric = "Neither the `x` nor `y` variable appears to be numeric."
 
@@ -104,15 +239,51 @@ def infer_orient(x, y, orient=None):
         return "v"
     elif y is None:
         return "h"
-    elif is_categorical(y):
-        if is_categorical(x):
+    elif kind(y) == "categorical":
+        if kind(x) == "categorical":
             raise ValueError(no_numeric)
         else:
             return "h"
-    elif is_not_numeric(y):
-        if is_not_numeric(x):
+    elif kind(y) != "numeric":
+        if kind(x) != "numeric":
             raise ValueError(no_numeric)
         else:
             return "h"
     else:
         return "v"
+
+def partition(data, keys):
+    """Split data by the values of the keys columns in a single groupby pass.
+
+    Returns a dict mapping each present key tuple to its rows.
+    """
+    groups = {}
+    for key, positions in six.iteritems(data.groupby(keys, sort=False).indices):
+        if not isinstance(key, tuple):
+            key = (key,)
+        groups[key] = data.take(positions)
+    return groups
+
+def parallel_map(func, tasks, n_jobs=None, executor=None):
+    """Apply func to each task in order, on executor or a pool of n_jobs processes if given."""
+    if executor is not None:
+        return list(executor.map(func, tasks))
+    if n_jobs is None or n_jobs == 1 or len(tasks) < 2:
+        return [func(task) for task in tasks]
+    import multiprocessing
+    pool = multiprocessing.Pool(None if n_jobs < 0 else n_jobs)
+    try:
+        return pool.map(func, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+def write_atomic(path, write):
+    """Call write with a temporary path then rename it to path, so concurrent readers never see partial files."""
+    tmp = "%s.%s.tmp" % (path, os.getpid())
+    try:
+        write(tmp)
+        os.rename(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
@@ -0,0 +1,45 @@
+import altair as alt
+import pandas as pd
+import pytest
+
+from seaborn_altair import FacetGrid
+
+def _colored_points(data, **kwargs):
+    # One layer per group present in the facet
+    layers = []
+    for group, color in [("a", "red"), ("b", "blue")]:
+        part = data[data["g"] == group]
+        if len(part):
+            layers.append(alt.Chart(part[["x", "y"]]).mark_point(color=color).encode(x="x:Q", y="y:Q"))
+    return alt.LayerChart(layer=layers)
+
+def _layer_colors(chart):
+    colors = {}
+    for layer in chart.spec.layer:
+        index = int(layer.transform[0].filter.split("==")[1])
+        colors[index] = layer.mark.color
+    return colors
+
+def test_partitioned_facets_with_missing_layers():
+    data = pd.DataFrame({
+        "f": ["f1", "f1", "f2", "f2"],
+        "g": ["a", "b", "b", "b"],
+        "x": [0, 1, 2, 3],
+        "y": [0, 1, 2, 3],
+    })
+    g = FacetGrid(data, col="f", partitioned=True).map_dataframe(_colored_points)
+    colors = _layer_colors(g.chart)
+    combined = g.chart.data
+    for _, row in combined.iterrows():
+        expected = "red" if row["x"] == 0 else "blue"
+        assert colors[row["facet_layer"]] == expected
+
+def test_partitioned_facets_with_unknown_layers():
+    data = pd.DataFrame({
+        "f": ["f1", "f1", "f2"],
+        "g": ["a", "a", "b"],
+        "x": [0, 1, 2],
+        "y": [0, 1, 2],
+    })
+    with pytest.raises(ValueError):
+        FacetGrid(data, col="f", partitioned=True).map_dataframe(_colored_points)
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from seaborn_altair import barplot, pointplot
+from seaborn_altair.cache import SpecCache
+from seaborn_altair.datasets import data_options
+from seaborn_altair.pyplot import scatter
+
+def _data():
+    rng = np.random.RandomState(0)
+    return pd.DataFrame({"x": rng.rand(50), "y": rng.rand(50), "c": rng.choice(list("ab"), 50)})
+
+def test_equivalent_calls_share_keys():
+    cache = SpecCache()
+    data = _data()
+    key = cache.key(scatter, "x", "y", data=data)
+    assert cache.key(scatter, x="x", y="y", data=data) == key
+    assert cache.key(scatter, "x", "y", data=data, max_points=None) == key
+    assert cache.key(scatter, "x", "y", data=data, max_points=10) != key
+
+def test_keys_cover_functions_and_data_options():
+    cache = SpecCache()
+    data = _data()
+    assert cache.key(barplot, x="c", y="y", data=data) != cache.key(pointplot, x="c", y="y", data=data)
+    key = cache.key(scatter, "x", "y", data=data)
+    with data_options(significant_digits=2):
+        assert cache.key(scatter, "x", "y", data=data) != key
+
+def test_cached_specs_follow_data_options():
+    cache = SpecCache()
+    data = _data()
+    plain = cache.to_json(scatter, "x", "y", data=data)
+    with data_options(significant_digits=2):
+        rounded = cache.to_json(scatter, "x", "y", data=data)
+    assert len(rounded) < len(plain)
+    assert cache.to_json(scatter, x="x", y="y", data=data) == plain
+    assert cache.stats()["hits"] == 1
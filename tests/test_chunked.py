@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from seaborn_altair import barplot
+from seaborn_altair.chunked import is_chunked
+from seaborn_altair.pyplot import hist, scatter
+
+def _counts(chart):
+    return [row["count"] for row in chart.data.to_dict("records")]
+
+def test_plain_iterables_are_not_chunked():
+    assert not is_chunked(pd.Index([1, 2, 3]))
+    assert not is_chunked(range(3))
+    assert not is_chunked({"a": 1}.keys())
+    assert not is_chunked([1, 2, 3])
+    assert is_chunked([np.arange(3), np.arange(3)])
+
+def test_hist_of_index():
+    values = np.random.RandomState(0).rand(100)
+    expected = _counts(hist(values, bins=5, range=(0, 1)))
+    assert _counts(hist(pd.Index(values), bins=5, range=(0, 1))) == expected
+    assert _counts(hist((v for v in values), bins=5, range=(0, 1))) == expected
+    assert _counts(hist((values[i:i + 10] for i in range(0, 100, 10)), bins=5, range=(0, 1))) == expected
+
+def test_scatter_of_index():
+    chart = scatter(pd.Index([1, 2, 3]), pd.Index([4, 5, 6]))
+    assert len(chart.data) == 3
+
+def test_barplot_of_chunk_generator():
+    rng = np.random.RandomState(0)
+    data = pd.DataFrame({"c": rng.choice(list("ab"), 100), "y": rng.rand(100)})
+    expected = barplot(x="c", y="y", data=data, aggregate="server").data
+    chunked = barplot(x="c", y="y", data=(data.iloc[i:i + 30] for i in range(0, 100, 30))).data
+    pd.testing.assert_frame_equal(chunked.sort_values("c").reset_index(drop=True), expected.sort_values("c").reset_index(drop=True))
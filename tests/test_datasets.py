@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from seaborn_altair import scatterplot, stripplot
+from seaborn_altair.datasets import data_options
+
+def _data(n=2000, seed=0):
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        "x": rng.rand(n),
+        "y": rng.rand(n),
+        "species": rng.choice(["setosa", "versicolor", "virginica"], n),
+        "id": ["sample-%d" % i for i in range(n)],
+    })
+
+def test_dictionary_encode_makes_specs_smaller():
+    data = _data()
+    for build in [
+        lambda: scatterplot(x="x", y="y", hue="species", data=data),
+        lambda: stripplot(x="species", y="y", data=data),
+    ]:
+        plain = build().to_json()
+        with data_options(dictionary_encode=True):
+            encoded = build().to_json()
+        assert len(encoded) < len(plain)
+
+def test_dictionary_encode_skips_columns_it_would_grow():
+    data = _data(20)
+    data["group"] = np.where(np.arange(len(data)) % 2, "a", "b")
+    plain = scatterplot(x="x", y="y", hue="group", data=data).to_json()
+    with data_options(dictionary_encode=True):
+        encoded = scatterplot(x="x", y="y", hue="group", data=data).to_json()
+    assert encoded == plain
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from seaborn_altair import scatterplot
+from seaborn_altair.pyplot import hist, plot
+from seaborn_altair.streaming import StreamingChart
+
+def _data(n=100):
+    return pd.DataFrame({"t": np.arange(n, dtype=float), "y": np.random.RandomState(0).rand(n)})
+
+def test_streaming_appends_rows():
+    chart = StreamingChart(plot, _data(), x="t", y="y", max_rows=150)
+    changes = chart.append(_data(100))
+    assert len(changes["insert"]) == 100
+    assert len(changes["remove"]) == 50
+    assert len(chart.values()) == 150
+
+def test_streaming_rejects_reduced_charts():
+    with pytest.raises(ValueError):
+        StreamingChart(plot, _data(1000), x="t", y="y", decimate=100)
+    with pytest.raises(ValueError):
+        StreamingChart(scatterplot, _data(1000), x="t", y="y", max_points=100)
+
+def test_streaming_rejects_aggregated_charts():
+    with pytest.raises(ValueError):
+        StreamingChart(hist, _data(), x="y")
@@ -0,0 +1,43 @@
+import os
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from seaborn_altair import lmplot
+from seaborn_altair.datasets import data_options
+from seaborn_altair.transport import DataStore
+
+def _urls(spec, urls):
+    if isinstance(spec, dict):
+        if "url" in spec:
+            urls.add(spec["url"])
+        for value in spec.values():
+            _urls(value, urls)
+    elif isinstance(spec, list):
+        for value in spec:
+            _urls(value, urls)
+    return urls
+
+def test_hoist_keeps_every_dataset_of_the_chart(tmp_path):
+    store = DataStore(str(tmp_path), max_files=1)
+    layers = [alt.Chart(pd.DataFrame({"x": [i, i + 1]})).mark_point().encode(x="x:Q") for i in range(3)]
+    chart = store.hoist(alt.LayerChart(layer=layers))
+    urls = _urls(chart.to_dict(validate=False), set())
+    assert len(urls) == 3
+    assert all(os.path.exists(url) for url in urls)
+
+def test_lmplot_keeps_every_dataset(tmp_path):
+    rng = np.random.RandomState(0)
+    data = pd.DataFrame({"x": rng.rand(60), "y": rng.rand(60), "c": rng.choice(["a", "b"], 60)})
+    with data_options(transport=DataStore(str(tmp_path), max_files=2)):
+        chart = lmplot("x", "y", data=data, col="c", n_boot=10, seed=0)
+    urls = _urls(chart.to_dict(validate=False), set())
+    assert len(urls) > 2
+    assert all(os.path.exists(url) for url in urls)
+
+def test_later_charts_evict_files(tmp_path):
+    store = DataStore(str(tmp_path), max_files=1)
+    for i in range(3):
+        store.hoist(alt.Chart(pd.DataFrame({"x": [i]})).mark_point())
+    assert len(store.files()) == 1